@@ -1,12 +1,11 @@
 # Description: Main script for running the bot and updating the dataset at regular intervals.
-import subprocess
 import time
 import sched
 import threading
-from observing.utils.get_coldkeys import find_owner_coldkey, find_validator_coldkey
 import os
 import sentry_sdk
 from dotenv import load_dotenv
+from observing.utils.jobs import run_job
 
 # Initialize Sentry
 def init_sentry(): 
@@ -19,29 +18,35 @@ def init_sentry():
     )
 
 def run_bot():
-    """Runs a specified script."""
+    """
+    Runs the persistent block observer from run.py.
+    The observer never returns, so if it stops the whole process exits and the container is restarted,
+    instead of the dataset scheduler running on without an observer.
+    """
     try:
-        subprocess.run(['python', 'run.py'])  # Replace 'run.py' with the actual filename if different
+        from run import run_observer
+        run_observer()
     except Exception as e:
         sentry_sdk.capture_exception(e)
         print(f"Exception in run_bot (main.py): {e}")
+    sentry_sdk.flush()
+    os._exit(1)
 
-def schedule_bot(scheduler, interval):
-    """Schedules the bot to run at regular intervals."""
+def start_bot():
+    """Starts the block observer in a background thread. It subscribes to new block headers itself, so it is started only once."""
     try:
-        threading.Thread(target=run_bot).start()
-        scheduler.enter(interval, 1, schedule_bot, (scheduler, interval))
+        threading.Thread(target=run_bot, daemon=True).start()
     except Exception as e:
         sentry_sdk.capture_exception(e)
-        print(f"Exception in schedule_bot (main.py): {e}")
+        print(f"Exception in start_bot (main.py): {e}")
 
 def update_coldkeys():
     """Runs find_validator_coldkey and find_owner_coldkey in sequence."""
     try:
-        status = check_thread_status()
-        if status == 'not running':
-            find_owner_coldkey()
-        find_validator_coldkey()
+        from observing.utils.get_coldkeys import find_owner_coldkey, find_validator_coldkey
+        # The leases keep these from overlapping with refreshes started by the observer or another process
+        run_job('owner_refresh', find_owner_coldkey)
+        run_job('validator_refresh', find_validator_coldkey)
     except Exception as e:
         sentry_sdk.capture_exception(e)
         print(f"Exception in update_coldkeys (main.py): {e}")
@@ -55,28 +60,17 @@ def schedule_update_dataset(scheduler, interval):
         sentry_sdk.capture_exception(e)
         print(f"Exception in schedule_update_dataset (main.py): {e}")
 
-def check_thread_status():
-    try:
-        with open('thread_status.status', 'r') as f:
-            status = f.read().strip()
-            return status
-    except FileNotFoundError:
-        return 'not running'
-    except Exception as e:
-        sentry_sdk.capture_exception(e)
-        print(f"Exception in check_thread_status (main.py): {e}")
-        return 'not running'
-
 if __name__ == "__main__":
     init_sentry()
     
     try:
-        bot_interval = 12  # Interval in seconds for running the bot
-        update_dataset_interval = 86400  # Interval in seconds for updating the dataset (1 day)
-        initial_delay = 86400  # Delay in seconds before starting the dataset update (1 hour)
+        # Interval in seconds for updating the dataset (1 day by default; chain-sourced datasets can refresh far more often)
+        update_dataset_interval = int(os.getenv('DATASET_UPDATE_INTERVAL', 86400))
+        initial_delay = update_dataset_interval  # Delay in seconds before starting the dataset update
 
+        start_bot()
+        
         scheduler = sched.scheduler(time.time, time.sleep)
-        scheduler.enter(0, 1, schedule_bot, (scheduler, bot_interval))
         scheduler.enter(initial_delay, 1, schedule_update_dataset, (scheduler, update_dataset_interval))
         scheduler.run()
     except Exception as e:
@@ -1,16 +1,199 @@
 # bot.py
-# This script sends embed messages to a Discord channel using a webhook.
-# It defines a function to format the embed data and make a POST request.
-import requests
+# This script sends embed messages to Discord channels using webhooks.
+# Embeds for the same webhook are grouped into as few messages as Discord allows, sent over one
+# keep-alive session, and posts that fail are kept in the discord_outbox table and retried later by a
+# background worker, so an outage never holds up the block that is being reported.
 import json
+import time
+import threading
+import requests
+import sentry_sdk
+from observing.utils.storage import connection, transaction
+
+MAX_EMBEDS_PER_MESSAGE = 10  # Discord limit
+MAX_EMBED_CHARS_PER_MESSAGE = 6000  # Discord limit on the total text of the embeds in one message
+MAX_ATTEMPTS = 3  # Attempts per post before it goes to the retry queue
+RETRY_QUEUE_DELAY = 60  # Seconds before a queued post is retried, doubled after each failed retry
+RETRY_WORKER_INTERVAL = 30  # Seconds between two runs of the retry worker
+
+_session = None
+_session_lock = threading.Lock()
+_rate_limit_reset = {}  # webhook_url -> time.monotonic() at which its bucket has requests again
+_retry_worker = None
+_retry_worker_lock = threading.Lock()
+
+def get_session():
+    """Returns the keep-alive session shared by all webhook posts."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update({"Content-Type": "application/json"})
+        return _session
+
+def embed_size(embed):
+    """Counts the characters Discord counts against the 6000 character limit."""
+    size = len(embed.get('title') or '') + len(embed.get('description') or '')
+    for field in embed.get('fields', []):
+        size += len(field.get('name') or '') + len(field.get('value') or '')
+    return size
 
+def chunk_embeds(embeds):
+    """Splits embeds into lists that fit in one Discord message."""
+    chunks = []
+    chunk, chunk_size = [], 0
+    for embed in embeds:
+        size = embed_size(embed)
+        if chunk and (len(chunk) == MAX_EMBEDS_PER_MESSAGE or chunk_size + size > MAX_EMBED_CHARS_PER_MESSAGE):
+            chunks.append(chunk)
+            chunk, chunk_size = [], 0
+        chunk.append(embed)
+        chunk_size += size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
 
+def _wait_for_bucket(webhook_url):
+    delay = _rate_limit_reset.get(webhook_url, 0) - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
 
+def _update_bucket(webhook_url, response):
+    """Remembers when the webhook's rate-limit bucket is refilled if it is empty."""
+    if response.headers.get('X-RateLimit-Remaining') == '0':
+        try:
+            reset_after = float(response.headers.get('X-RateLimit-Reset-After', 0))
+        except ValueError:
+            reset_after = 0
+        _rate_limit_reset[webhook_url] = time.monotonic() + reset_after
 
+def send_message(webhook_url, payload, attempts=MAX_ATTEMPTS):
+    """
+    Posts one message to a webhook, honouring Discord's rate-limit headers.
+    Retries 429 and 5xx responses up to attempts times.
+    Returns (status_code, text) of the last response, or (None, error) if the request could not be sent.
+    """
+    status_code, text = None, None
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(retry_delay)
+        _wait_for_bucket(webhook_url)
+        try:
+            response = get_session().post(webhook_url, data=json.dumps(payload), timeout=15)
+        except requests.RequestException as e:
+            status_code, text = None, str(e)
+            retry_delay = 2 ** attempt
+            continue
+        status_code, text = response.status_code, response.text
+        _update_bucket(webhook_url, response)
+        if response.status_code == 429:
+            try:
+                retry_delay = float(response.json().get('retry_after', 1))
+            except ValueError:
+                retry_delay = float(response.headers.get('Retry-After', 1))
+            continue
+        if response.status_code >= 500:
+            retry_delay = 2 ** attempt
+            continue
+        break
+    return status_code, text
 
+def _is_delivered(status_code):
+    # 4xx other than 429 means the message itself is rejected; retrying it would not help
+    return status_code is not None and status_code < 500 and status_code != 429
 
+def queue_for_retry(webhook_url, payload, attempts=1, delay=RETRY_QUEUE_DELAY):
+    """Stores a failed post in the on-disk retry queue, due in delay seconds."""
+    now = int(time.time())
+    with transaction() as conn:
+        conn.execute(
+            'INSERT INTO discord_outbox (webhook_url, payload, attempts, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)',
+            (webhook_url, json.dumps(payload), attempts, now + delay, now),
+        )
 
+def _has_queued_posts(webhook_url):
+    with connection() as conn:
+        return conn.execute('SELECT 1 FROM discord_outbox WHERE webhook_url = ? LIMIT 1', (webhook_url,)).fetchone() is not None
 
+def flush_retry_queue():
+    """
+    Re-sends the queued posts that are due, oldest first. Posts that fail again are rescheduled with a longer delay.
+    The posts of a webhook are sent in the order they were queued: after the first failure, or while its oldest
+    post is not due yet, the others wait for the next run.
+    """
+    try:
+        now = int(time.time())
+        with connection() as conn:
+            queued = conn.execute(
+                'SELECT id, webhook_url, payload, attempts, next_attempt_at FROM discord_outbox ORDER BY id'
+            ).fetchall()
+        waiting = set()
+        for outbox_id, webhook_url, payload, attempts, next_attempt_at in queued:
+            if webhook_url in waiting:
+                continue
+            if next_attempt_at > now:
+                waiting.add(webhook_url)
+                continue
+            status_code, text = send_message(webhook_url, json.loads(payload))
+            if not _is_delivered(status_code):
+                waiting.add(webhook_url)
+            with transaction() as conn:
+                if _is_delivered(status_code):
+                    conn.execute('DELETE FROM discord_outbox WHERE id = ?', (outbox_id,))
+                else:
+                    conn.execute(
+                        'UPDATE discord_outbox SET attempts = ?, next_attempt_at = ? WHERE id = ?',
+                        (attempts + 1, int(time.time()) + RETRY_QUEUE_DELAY * 2 ** min(attempts, 6), outbox_id),
+                    )
+    except Exception as e:
+        sentry_sdk.capture_exception(e)
+        print(f"Exception in flush_retry_queue (observing/bot/bot.py): {e}")
+
+def _run_retry_worker():
+    while True:
+        time.sleep(RETRY_WORKER_INTERVAL)
+        flush_retry_queue()
+
+def start_retry_worker():
+    """Starts the background thread that re-sends the queued posts, once per process."""
+    global _retry_worker
+    with _retry_worker_lock:
+        if _retry_worker is None:
+            _retry_worker = threading.Thread(target=_run_retry_worker, name='discord-outbox', daemon=True)
+            _retry_worker.start()
+
+def deliver(reports):
+    """
+    Posts a batch of reports, one round-trip per webhook whenever the embeds fit in one message.
+    Each message is sent once; if that fails it is queued, and the retry worker sends it later. While a webhook
+    has queued posts, new messages are queued behind them, so the reports still arrive in block order.
+
+    Parameters:
+    reports (list): (embed, webhook_url) pairs. Empty embeds are skipped. The order of the embeds is kept per webhook.
+    """
+    by_webhook = {}
+    for embed, webhook_url in reports:
+        if embed and webhook_url:
+            by_webhook.setdefault(webhook_url, []).append(embed)
+
+    start_retry_worker()
+    for webhook_url, embeds in by_webhook.items():
+        try:
+            # While older posts to this webhook wait in the queue, or once a post failed, the rest are queued
+            queue_only = _has_queued_posts(webhook_url)
+            for chunk in chunk_embeds(embeds):
+                payload = {"embeds": chunk}
+                if queue_only:
+                    queue_for_retry(webhook_url, payload, attempts=0, delay=0)
+                    continue
+                status_code, text = send_message(webhook_url, payload, attempts=1)
+                if not _is_delivered(status_code):
+                    queue_only = True
+                    print(f"Discord post failed ({status_code}): {text}. Queued for retry.")
+                    queue_for_retry(webhook_url, payload)
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            print(f"Exception in deliver (observing/bot/bot.py): {e}")
 
 def post_to_discord(embed, webhook_url):
     # print(webhook_url)
@@ -19,6 +202,7 @@ def post_to_discord(embed, webhook_url):
     data = {
         "embeds": [embed]
     }
-    response = requests.post(webhook_url, data=json.dumps(data), headers={"Content-Type": "application/json"})
-    return response.status_code, response.text
-
+    status_code, text = send_message(webhook_url, data)
+    if not _is_delivered(status_code):
+        queue_for_retry(webhook_url, data, MAX_ATTEMPTS)
+    return status_code, text
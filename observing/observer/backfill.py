@@ -0,0 +1,56 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import sentry_sdk
+
+
+def ordered_map(executor, func, items, window):
+    """
+    Submits func(item) for every item to the executor, keeping at most `window` calls in flight,
+    and yields (item, result) pairs in the order of items.
+    """
+    pending = deque()
+    for item in items:
+        pending.append((item, executor.submit(func, item)))
+        if len(pending) >= window:
+            item, future = pending.popleft()
+            yield item, future.result()
+    while pending:
+        item, future = pending.popleft()
+        yield item, future.result()
+
+def fetch_blocks(block_numbers, connect, fetch, workers=4):
+    """
+    Fetches a range of blocks with a bounded pool of concurrent fetchers and yields (block_number, data) in block order.
+
+    Parameters:
+    block_numbers (iterable): The block numbers to fetch, in the order they should be yielded.
+    connect (callable): Opens a new chain connection. Each worker thread gets its own connection.
+    fetch (callable): fetch(connection, block_number) returns the data of one block.
+    workers (int): The number of concurrent fetchers.
+    """
+    local = threading.local()
+    connections = []
+    lock = threading.Lock()
+
+    def fetch_one(block_number):
+        connection = getattr(local, 'connection', None)
+        if connection is None:
+            connection = local.connection = connect()
+            if connection is None:
+                raise ConnectionError("Could not open a connection for the backfill worker")
+            with lock:
+                connections.append(connection)
+        return fetch(connection, block_number)
+
+    workers = max(1, workers)
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backfill') as executor:
+            yield from ordered_map(executor, fetch_one, block_numbers, workers * 2)
+    finally:
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception as e:
+                sentry_sdk.capture_exception(e)
+                print(f"Exception in fetch_blocks (observing/observer/backfill.py): {e}")
@@ -0,0 +1,65 @@
+import pytz
+from datetime import datetime
+
+# Single-pass index of a block.
+# index_block() walks the extrinsics once and the events once; the detectors in observer.py
+# then query the resulting dict instead of rescanning the block for every match.
+
+def format_block_timestamp(timestamp_ms):
+    """Formats a Timestamp.set value (milliseconds) as 'YYYY-MM-DD HH:MM:SS (UTC±X)'."""
+    dt_utc = datetime.fromtimestamp(timestamp_ms / 1000, tz=pytz.UTC)
+    utc_offset = dt_utc.strftime('%z')
+    formatted_offset = f'UTC{utc_offset[:3]}:{utc_offset[3:]}'
+    return dt_utc.strftime(f'%Y-%m-%d %H:%M:%S ({formatted_offset})')
+
+def index_block(extrinsics, events):
+    """
+    Builds the index of one block.
+
+    Returns:
+    dict: {
+        'timestamp': the formatted block timestamp, or None,
+        'calls': (call_module, call_function) -> list of extrinsic indexes, in block order,
+        'events_by_extrinsic': extrinsic index -> list of its events,
+        'extrinsic_success': extrinsic index -> True if it emitted ExtrinsicSuccess,
+        'events_by_id': event_id -> list of events, in block order,
+        'events': (event_id, event) of every event, in block order,
+    }
+    """
+    index = {
+        'timestamp': None,
+        'calls': {},
+        'events_by_extrinsic': {},
+        'extrinsic_success': {},
+        'events_by_id': {},
+        'events': [],
+    }
+
+    for idx, extrinsic in enumerate(extrinsics):
+        extrinsic_value = getattr(extrinsic, 'value', None)
+        if not extrinsic_value or 'call' not in extrinsic_value:
+            continue
+        call = extrinsic_value['call']
+        key = (call['call_module'], call['call_function'])
+        index['calls'].setdefault(key, []).append(idx)
+        if key == ('Timestamp', 'set') and index['timestamp'] is None:
+            index['timestamp'] = format_block_timestamp(call['call_args'][0]['value'])
+
+    for event in events:
+        event_value = getattr(event, 'value', None)
+        if not event_value:
+            continue
+        event_id = event_value.get('event_id')
+        index['events_by_id'].setdefault(event_id, []).append(event)
+        index['events'].append((event_id, event))
+        extrinsic_idx = event_value.get('extrinsic_idx')
+        if extrinsic_idx is not None:
+            index['events_by_extrinsic'].setdefault(extrinsic_idx, []).append(event)
+            if event_id == 'ExtrinsicSuccess':
+                index['extrinsic_success'][extrinsic_idx] = True
+
+    return index
+
+def get_extrinsic_result(index, idx):
+    """Returns (events, success) of the extrinsic at idx, without rescanning the events."""
+    return index['events_by_extrinsic'].get(idx, []), index['extrinsic_success'].get(idx, False)
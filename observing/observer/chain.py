@@ -0,0 +1,130 @@
+import os
+import time
+import threading
+import sentry_sdk
+from websocket import WebSocketException
+
+# Shared chain client.
+# One SubstrateInterface connection used for head discovery, block and event fetches and storage queries,
+# instead of a new connection (and metadata load) per use. The client forwards every SubstrateInterface
+# method and attribute, so it can be passed wherever a substrate object is expected. Calls are serialized
+# by a lock, a connection error triggers one reconnect and retry, and a heartbeat thread pings the node
+# while the connection is idle so dead sockets are noticed before the next block arrives.
+# A connection that is busy, e.g. with a block header subscription, is not pinged; whoever holds it watches
+# it and calls abort() if it stops delivering (see watch_subscription() in observer.py).
+
+RECONNECT_ERRORS = (ConnectionError, WebSocketException)
+
+class ChainClient:
+
+    def __init__(self, connect, heartbeat_interval=30):
+        """
+        Parameters:
+        connect (callable): returns a new SubstrateInterface, or None if the node cannot be reached.
+        heartbeat_interval (int): seconds of idle time after which the connection is pinged (0 disables the heartbeat).
+        """
+        self._connect = connect
+        self._lock = threading.RLock()
+        self._substrate = None
+        self._last_used = time.monotonic()
+        self._heartbeat_interval = heartbeat_interval
+        if heartbeat_interval:
+            threading.Thread(target=self._heartbeat, daemon=True).start()
+
+    @property
+    def substrate(self):
+        """Returns the open SubstrateInterface, connecting first if needed."""
+        with self._lock:
+            if self._substrate is None:
+                substrate = self._connect()
+                if substrate is None:
+                    raise ConnectionError("Could not connect to SUBTENSOR_ENDPOINT")
+                self._substrate = substrate
+            return self._substrate
+
+    def reconnect(self):
+        """Drops the current connection; the next call opens a new one."""
+        with self._lock:
+            if self._substrate is not None:
+                try:
+                    self._substrate.close()
+                except Exception:
+                    pass
+            self._substrate = None
+
+    def abort(self):
+        """
+        Closes the socket of the current connection without waiting for the lock, so a call blocked on it
+        (e.g. a subscription on a half-open socket) fails and is retried on a new connection.
+        """
+        substrate = self._substrate
+        if substrate is not None:
+            try:
+                substrate.close()
+            except Exception as e:
+                sentry_sdk.capture_exception(e)
+                print(f"Exception in ChainClient.abort (observing/observer/chain.py): {e}")
+
+    def run(self, func, *args, **kwargs):
+        """
+        Calls func(substrate, *args, **kwargs) with the lock held, reconnecting and retrying once if the connection
+        is broken. Used for work that spans several requests, e.g. iterating every page of a query_map result.
+        """
+        with self._lock:
+            self._last_used = time.monotonic()
+            try:
+                return func(self.substrate, *args, **kwargs)
+            except RECONNECT_ERRORS as e:
+                print(f"Chain connection lost ({e}), reconnecting")
+                self.reconnect()
+                return func(self.substrate, *args, **kwargs)
+            finally:
+                self._last_used = time.monotonic()
+
+    def call(self, method, *args, **kwargs):
+        """Calls a SubstrateInterface method, reconnecting and retrying once if the connection is broken."""
+        return self.run(lambda substrate: getattr(substrate, method)(*args, **kwargs))
+
+    def get_head_number(self):
+        """Returns the number of the current best block."""
+        return self.call('get_block_number', None)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        value = getattr(self.substrate, name)
+        if callable(value):
+            return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+        return value
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self._heartbeat_interval)
+            if time.monotonic() - self._last_used < self._heartbeat_interval or self._substrate is None:
+                continue
+            # A busy connection (e.g. a running subscription) is alive anyway; don't wait for it
+            if not self._lock.acquire(blocking=False):
+                continue
+            try:
+                self._substrate.rpc_request('system_health', [])
+                self._last_used = time.monotonic()
+            except Exception as e:
+                sentry_sdk.capture_exception(e)
+                print(f"Exception in ChainClient heartbeat (observing/observer/chain.py): {e}")
+                self.reconnect()
+            finally:
+                self._lock.release()
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_chain_client(lane='main'):
+    """
+    Returns the process-wide chain client of a lane, created on first use.
+    Each lane has its own connection, so requests on different lanes (e.g. 'main' and 'events') run concurrently.
+    """
+    with _clients_lock:
+        if lane not in _clients:
+            from observing.observer.observer import setup_substrate_interface
+            _clients[lane] = ChainClient(setup_substrate_interface, int(os.getenv('CHAIN_HEARTBEAT_INTERVAL', 30)))
+        return _clients[lane]
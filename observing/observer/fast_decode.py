@@ -0,0 +1,99 @@
+from scalecodec.base import ScaleBytes
+import sentry_sdk
+
+# Raw SCALE fast path for block decoding.
+# substrate.get_block() decodes every extrinsic into nested dicts, although the detectors only look at
+# a few calls; most extrinsics in a Bittensor block are large set_weights calls. get_block_fast() reads
+# only the call index (pallet byte, call byte) from the raw extrinsic bytes and fully decodes just the
+# extrinsics whose call is watched. The other positions in the extrinsics list are None, so extrinsic
+# indexes still match the extrinsic_idx of the events.
+
+# MultiAddress variant -> fixed length in bytes (None: compact length prefix, 1: compact AccountIndex)
+_ADDRESS_LENGTHS = {0: 32, 1: 'index', 2: None, 3: 32, 4: 20}
+# MultiSignature variant -> length in bytes
+_SIGNATURE_LENGTHS = {0: 64, 1: 64, 2: 65}
+
+_call_index_cache = {}
+
+def _read_compact(data, offset):
+    """Reads a SCALE compact integer and returns (value, new_offset)."""
+    mode = data[offset] & 0b11
+    if mode == 0:
+        return data[offset] >> 2, offset + 1
+    if mode == 1:
+        return int.from_bytes(data[offset:offset + 2], 'little') >> 2, offset + 2
+    if mode == 2:
+        return int.from_bytes(data[offset:offset + 4], 'little') >> 2, offset + 4
+    length = (data[offset] >> 2) + 4
+    return int.from_bytes(data[offset + 1:offset + 1 + length], 'little'), offset + 1 + length
+
+def _skip_address(data, offset):
+    variant = data[offset]
+    length = _ADDRESS_LENGTHS[variant]
+    offset += 1
+    if length == 'index':
+        return _read_compact(data, offset)[1]
+    if length is None:
+        length, offset = _read_compact(data, offset)
+    return offset + length
+
+def _skip_signed_extensions(substrate, data, offset):
+    """Decodes only the signed extension fields (era, nonce, tip, ...) to find where the call starts."""
+    scale_bytes = ScaleBytes(data)
+    scale_bytes.offset = offset
+    for extension in substrate.metadata.get_signed_extensions().values():
+        obj = substrate.runtime_config.create_scale_object(extension['extrinsic'], data=scale_bytes, metadata=substrate.metadata)
+        obj.decode(check_remaining=False)
+    return scale_bytes.offset
+
+def read_call_index(substrate, data):
+    """Returns the call index ('0700' style hex: pallet byte, call byte) of a raw extrinsic without decoding its call."""
+    _, offset = _read_compact(data, 0)  # Length prefix
+    version = data[offset]
+    offset += 1
+    if version & 0x80:
+        offset = _skip_address(data, offset)
+        offset += 1 + _SIGNATURE_LENGTHS[data[offset]]
+        offset = _skip_signed_extensions(substrate, data, offset)
+    return data[offset:offset + 2].hex()
+
+def get_call_index_map(substrate):
+    """Returns call index -> (call_module, call_function) for the current runtime, cached per spec version."""
+    runtime_version = substrate.runtime_version
+    if runtime_version not in _call_index_cache:
+        call_index_map = {}
+        for call_index, (module, call) in substrate.metadata.call_index.items():
+            call_index_map[call_index] = (module.name, call.name)
+        _call_index_cache[runtime_version] = call_index_map
+    return _call_index_cache[runtime_version]
+
+def decode_extrinsic(substrate, extrinsic_data):
+    """Fully decodes one raw extrinsic, like substrate.get_block() does."""
+    extrinsic = substrate.runtime_config.create_scale_object('Extrinsic', data=ScaleBytes(extrinsic_data), metadata=substrate.metadata)
+    extrinsic.decode(check_remaining=True)
+    return extrinsic
+
+def get_block_fast(substrate, block_hash, watched_calls):
+    """
+    Fetches a block and decodes only the extrinsics whose (call_module, call_function) is in watched_calls.
+    Extrinsics whose call index cannot be read are decoded fully, so nothing is missed.
+    Returns a dict with 'extrinsics' (decoded extrinsic or None per position) and 'header', like substrate.get_block().
+    """
+    substrate.init_runtime(block_hash=block_hash)
+    response = substrate.rpc_request('chain_getBlock', [block_hash])
+    raw_block = response['result']['block']
+    call_index_map = get_call_index_map(substrate)
+
+    extrinsics = []
+    for extrinsic_data in raw_block['extrinsics']:
+        try:
+            call = call_index_map.get(read_call_index(substrate, bytes.fromhex(extrinsic_data[2:])))
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            print(f"Exception in get_block_fast (observing/observer/fast_decode.py): {e}")
+            call = None
+        if call is None or call in watched_calls:
+            extrinsics.append(decode_extrinsic(substrate, extrinsic_data))
+        else:
+            extrinsics.append(None)
+    return {'header': raw_block['header'], 'extrinsics': extrinsics}
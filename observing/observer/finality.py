@@ -0,0 +1,99 @@
+import os
+from collections import OrderedDict
+
+# Finality and reorg handling for the live observer.
+#
+# FINALITY_MODE picks the trade-off between latency and certainty:
+#   best          - report every best head as soon as it arrives (lowest latency). Reorgs are detected
+#                   against a window of recent block hashes and the reports of orphaned blocks are retracted.
+#   confirmations - follow best heads but report block N - FINALITY_CONFIRMATIONS, so short forks are
+#                   resolved before anything is posted. Reorg detection stays on for deeper forks.
+#   finalized     - follow finalized heads only. Nothing is ever retracted, at the cost of finality lag.
+#
+# In every mode a block hash that was already reported is not reported again.
+
+FINALITY_MODES = ('best', 'confirmations', 'finalized')
+
+def get_finality_settings():
+    """Returns (mode, confirmations, window size) from FINALITY_MODE, FINALITY_CONFIRMATIONS and REORG_WINDOW."""
+    mode = os.getenv('FINALITY_MODE', 'best')
+    if mode not in FINALITY_MODES:
+        raise ValueError(f"FINALITY_MODE must be one of {', '.join(FINALITY_MODES)}, not {mode!r}")
+    confirmations = int(os.getenv('FINALITY_CONFIRMATIONS', 3)) if mode == 'confirmations' else 0
+    return mode, confirmations, int(os.getenv('REORG_WINDOW', 64))
+
+class BlockTracker:
+    """
+    In-memory window of the most recently reported blocks: number -> hash, parent hash, reports and the
+    callables that revert the block's database updates.
+    """
+
+    def __init__(self, window_size=64):
+        self.window_size = window_size
+        self.blocks = OrderedDict()
+
+    def is_duplicate(self, block_number, block_hash):
+        """Returns True if this exact block was already reported."""
+        entry = self.blocks.get(block_number)
+        return entry is not None and entry['hash'] == block_hash
+
+    def find_retracted(self, block_number, parent_hash, get_block_hash):
+        """
+        Returns the numbers of the recorded blocks that are not on the chain of the new block, in ascending order.
+
+        Parameters:
+        block_number (int): The number of the new block.
+        parent_hash (str): The parent hash of the new block.
+        get_block_hash (callable): Returns the current canonical hash of a block number.
+        """
+        # Anything recorded at or above the new block's height belongs to the old fork
+        retracted = [number for number in self.blocks if number >= block_number]
+        parent = self.blocks.get(block_number - 1)
+        if parent is not None and parent['hash'] != parent_hash:
+            number = block_number - 1
+            while number in self.blocks and self.blocks[number]['hash'] != get_block_hash(number):
+                retracted.append(number)
+                number -= 1
+        return sorted(retracted)
+
+    def record(self, block_number, block_hash, parent_hash, reports, undo=None):
+        self.blocks[block_number] = {'hash': block_hash, 'parent_hash': parent_hash, 'reports': reports, 'undo': undo or []}
+        self.blocks.move_to_end(block_number)
+        while len(self.blocks) > self.window_size:
+            self.blocks.popitem(last=False)
+
+    def retract(self, block_numbers):
+        """
+        Forgets the given blocks, reverts their database updates (newest first) and returns retraction reports
+        for everything they reported.
+        """
+        retractions = []
+        entries = [(block_number, self.blocks.pop(block_number, None)) for block_number in block_numbers]
+        for block_number, entry in reversed(entries):
+            for revert in reversed(entry['undo'] if entry else []):
+                revert()
+        for block_number, entry in entries:
+            if entry is None:
+                continue
+            for report in entry['reports']:
+                retractions.append({
+                    'name': f"{report['name']}_retracted",
+                    'channel': report['channel'],
+                    'report': generate_retraction(block_number, entry['hash'], report['report']),
+                })
+        return retractions
+
+def generate_retraction(block_number, block_hash, report):
+    """Generates the report that withdraws a report of a block that was reorganised away."""
+    return {
+        "title": f"↩️ __RETRACTED__ {report.get('title', '')}",
+        "description": "This block is no longer part of the chain; the report below did not happen.",
+        "color": 8421504,  # Grey for retractions
+        "fields": [
+            {
+                "name": "🧱 **ORPHANED BLOCK** 🧱",
+                "value": f"{block_number}\n{block_hash}\n\n",
+                "inline": False
+            },
+        ] + report.get('fields', []),
+    }
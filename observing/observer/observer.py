@@ -1,11 +1,24 @@
-import pytz
-from datetime import datetime
-from substrateinterface.base import SubstrateInterface
-import bittensor as bt
+import time
 import sqlite3
 import sentry_sdk
 from dotenv import load_dotenv
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from observing.observer.backfill import fetch_blocks
+from observing.observer.registry import register_extrinsic_detector, register_event_detector, run_detectors, get_watched_calls
+from observing.observer.fast_decode import get_block_fast
+from observing.observer.runtime_cache import CachedSubstrateInterface
+from observing.observer.chain import get_chain_client
+from observing.observer.finality import BlockTracker, get_finality_settings
+from observing.observer.block_index import index_block, get_extrinsic_result
+from observing.utils.storage import transaction
+from observing.utils.cursor import get_cursor, advance_cursor, mark_block, get_gaps, get_logged_extent
+from observing.utils.account_keys import to_db_key
+from observing.utils.account_index import find_validator_by_coldkey, find_validator_by_hotkey, find_owner_netuid, refresh_index
+
+_events_executor = None
+_events_executor_lock = threading.Lock()
 
 # Initialize Sentry
 def init_sentry(): 
@@ -23,10 +36,11 @@ def setup_substrate_interface():
     """
     Initializes and returns a SubstrateInterface object configured to connect to a specified WebSocket URL.
     This interface will be used to interact with the blockchain.
+    The runtime metadata comes from the on-disk cache (observing/observer/runtime_cache.py).
     """
     try:
         SUBTENSOR_ENDPOINT = os.getenv('SUBTENSOR_ENDPOINT')
-        return SubstrateInterface(
+        return CachedSubstrateInterface(
             url=SUBTENSOR_ENDPOINT,
             ss58_format=42,
             use_remote_preset=True,
@@ -36,69 +50,63 @@ def setup_substrate_interface():
         print(f"Exception in setup_substrate_interface (observing/observer/observer.py): {e}")
         return None
 
-def get_block_data(substrate, block_number):
+def get_events_executor():
+    """Returns the thread pool that fetches events while the block itself is fetched."""
+    global _events_executor
+    with _events_executor_lock:
+        if _events_executor is None:
+            _events_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='events')
+        return _events_executor
+
+def get_block_data(substrate, block_number, events_substrate=None, block_hash=None):
     """
     Retrieves block data and associated events from the blockchain for a given block number.
+    With FAST_DECODE enabled (default), only the extrinsics a detector watches are decoded; the others are None.
+    If events_substrate (a second connection) is given, the events are fetched on it concurrently with the block,
+    so the block costs the hash round-trip plus one more instead of two.
+    The block hash is stored in block['header']['hash'].
     """
     try:
-        block_hash = substrate.get_block_hash(block_id=block_number)
-        block = substrate.get_block(block_hash=block_hash)
-        events = substrate.get_events(block_hash=block_hash)
+        if block_hash is None:
+            block_hash = substrate.get_block_hash(block_id=block_number)
+        events_future = None
+        if events_substrate is not None:
+            events_future = get_events_executor().submit(events_substrate.get_events, block_hash=block_hash)
+        if os.getenv('FAST_DECODE', '1') != '0':
+            block = get_block_fast(substrate, block_hash, get_watched_calls())
+        else:
+            block = substrate.get_block(block_hash=block_hash)
+        if events_future is not None:
+            events = events_future.result()
+        else:
+            events = substrate.get_events(block_hash=block_hash)
+        block['header']['hash'] = block_hash
         return block, events
     except Exception as e:
         sentry_sdk.capture_exception(e)
         print(f"Exception in get_block_data (observing/observer/observer.py): {e}")
         return None, None
 
-def extract_block_timestamp(extrinsics):
-    """
-    Extracts the timestamp from a list of extrinsics by identifying the 'set' function call within the 'Timestamp' module.
-    Returns the timestamp formatted as 'YYYY-MM-DD HH:MM:SS (UTC±X)'.
-    """
-    try:
-        for extrinsic in extrinsics:
-            extrinsic_value = getattr(extrinsic, 'value', None)
-            if extrinsic_value and 'call' in extrinsic_value:
-                call = extrinsic_value['call']
-                if call['call_function'] == 'set' and call['call_module'] == 'Timestamp':
-                    # Convert timestamp from milliseconds to seconds
-                    timestamp = call['call_args'][0]['value'] / 1000
-                    # Create a timezone-aware datetime object
-                    dt_utc = datetime.fromtimestamp(timestamp, tz=pytz.UTC)
-                    
-                    # Format the datetime to include UTC offset
-                    utc_offset = dt_utc.strftime('%z')
-                    formatted_offset = f'UTC{utc_offset[:3]}:{utc_offset[3:]}'              
-                    return dt_utc.strftime(f'%Y-%m-%d %H:%M:%S ({formatted_offset})')
-        return None  # Return None if no valid timestamp is found
-    except Exception as e:
-        sentry_sdk.capture_exception(e)
-        print(f"Exception in extract_block_timestamp (observing/observer/observer.py): {e}")
-        return None
+def fetch_block_data(substrate, block_number, events_substrate=None):
+    """
+    Calls get_block_data() up to FETCH_ATTEMPTS times (default 3), waiting FETCH_RETRY_DELAY seconds (default 1)
+    after the first failure and twice as long after each further one. Returns (None, None) if every attempt failed.
+    """
+    attempts = max(1, int(os.getenv('FETCH_ATTEMPTS', 3)))
+    delay = float(os.getenv('FETCH_RETRY_DELAY', 1))
+    for attempt in range(attempts):
+        block, events = get_block_data(substrate, block_number, events_substrate)
+        if block is not None and events is not None:
+            return block, events
+        if attempt < attempts - 1:
+            print(f"Fetching block {block_number} failed, retrying in {delay} seconds")
+            time.sleep(delay)
+            delay *= 2
+    return None, None
 
-def check_extrinsic(extrinsics, func_schedule_swap_coldkey, func_schedule_dissolve_subnet, func_vote, module_name):
-    """
-    Checks for a specific extrinsic call in the list of extrinsics.
-    Returns the index if found, otherwise -1.
-    """
-    try:
-        schedule_swap_coldkey_idx, schedule_dissolve_network_idx, vote_idx = -1, -1, -1
-        for idx, extrinsic in enumerate(extrinsics):
-            extrinsic_value = getattr(extrinsic, 'value', None)
-            if extrinsic_value and 'call' in extrinsic_value:
-                call = extrinsic_value['call']
-                if call['call_module'] == module_name:
-                    if call['call_function'] == func_schedule_swap_coldkey:
-                        schedule_swap_coldkey_idx = idx
-                    elif call['call_function'] == func_schedule_dissolve_subnet:
-                        schedule_dissolve_network_idx = idx
-                    elif call['call_function'] == func_vote:
-                        vote_idx = idx
-        return schedule_swap_coldkey_idx, schedule_dissolve_network_idx, vote_idx
-    except Exception as e:
-        sentry_sdk.capture_exception(e)
-        print(f"Exception in check_extrinsic (observing/observer/observer.py): {e}")
-        return -1, -1, -1
+def get_backfill_limit():
+    """Returns BACKFILL_MAX_BLOCKS (default 300): the most blocks behind the head that the observer catches up on."""
+    return max(1, int(os.getenv('BACKFILL_MAX_BLOCKS', 300)))
 
 def process_swap_extrinsics(extrinsic_events):
     """
@@ -136,25 +144,6 @@ def process_dissolve_extrinsics(extrinsic_events):
         print(f"Exception in process_dissolve_extrinsics (observing/observer/observer.py): {e}")
         return None, None, None
 
-def check_success(events, idx):
-    """
-    Checks if an extrinsic was successful and collects its events.
-    """
-    try:
-        extrinsic_events = []
-        extrinsic_success = False
-        for event in events:
-            event_value = getattr(event, 'value', None)
-            if event_value and event_value.get('extrinsic_idx') == idx:
-                extrinsic_events.append(event)
-                if event_value['event_id'] == 'ExtrinsicSuccess':
-                    extrinsic_success = True
-        return extrinsic_events, extrinsic_success
-    except Exception as e:
-        sentry_sdk.capture_exception(e)
-        print(f"Exception in check_success (observing/observer/observer.py): {e}")
-        return [], False
-
 def generate_report(title, success, details, time_stamp):
     """
     Generates a report based on the extrinsic success and details provided.
@@ -306,173 +295,183 @@ def get_validator_name(coldkey, hotkey=None):
     tuple: (name, hot_key, status) where name and hot_key are the values of the validator if found,
            otherwise None, and status is 1 if the coldkey exists, otherwise 0.
     """
-    db_path = 'DB/db.sqlite3'  # Update this path to the actual location of your database
-    
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
         if coldkey:
-            cursor.execute('SELECT name, hot_key FROM validators WHERE cold_key = ?', (coldkey,))
-            result = cursor.fetchone()
+            result = find_validator_by_coldkey(coldkey)
         else:
-            cursor.execute('SELECT name, cold_key FROM validators WHERE hot_key = ?', (hotkey,))
-            result = cursor.fetchone()
+            result = find_validator_by_hotkey(hotkey)
         if result:
             return result[0], result[1], 1
         else:
             return None, None, 0
-    except sqlite3.Error as e:
+    except Exception as e:
         sentry_sdk.capture_exception(e)
-        print(f"Database error in get_validator_name (observing/observer/observer.py): {e}")
+        print(f"Exception in get_validator_name (observing/observer/observer.py): {e}")
         return None, None, 0
-    finally:
-        if conn:
-            conn.close()
 
 def get_owner_name(coldkey):
     """
-    Retrieves the name of the owner based on their coldkey.
+    Retrieves the net_uid of the subnet owned by a coldkey.
     
     Parameters:
     coldkey (str): The coldkey of the owner.
     
     Returns:
-    tuple: (name, status) where name is the value of the owner if found, otherwise None, and status is 1 if the coldkey exists, otherwise 0.
+    str: The net_uid of the owner if found, otherwise None.
     """
-    db_path = 'DB/db.sqlite3'  
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT net_uid FROM owners WHERE owner_coldkey = ?', (coldkey,))
-        result = cursor.fetchone()
-        if result:
-            return result[0]
-        else:
-            return None
-    except sqlite3.Error as e:
+        return find_owner_netuid(coldkey)
+    except Exception as e:
         sentry_sdk.capture_exception(e)
-        print(f"Database error in get_owner_name (observing/observer/observer.py): {e}")
+        print(f"Exception in get_owner_name (observing/observer/observer.py): {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
 
-def check_update_block_number(current_block_number):   
-    db_path = 'DB/db.sqlite3'
+def check_block_number(current_block_number, report_gaps=True):
+    """
+    Returns the block number stored in the cursor, or None if there is none.
+    With report_gaps, reports skipped blocks if the block number moved ahead by more than 1; callers that backfill
+    gaps themselves pass False. A repeated or lower block number (a head seen twice, a fork at the same height)
+    is not an error. The cursor itself is moved by advance_cursor() once the block has been handled.
+    """
+    previous_block_number = None
     try:
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Ensure the table exists before selecting from it
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS current_block_number (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                current_block_number TEXT
-            )
-            ''')
-            
-            # Retrieve the existing block number from the database
-            cursor.execute('SELECT current_block_number FROM current_block_number LIMIT 1')
-            result = cursor.fetchone()
-            
-            if result:
-                previous_block_number = int(result[0])
-                print(previous_block_number, current_block_number)
-                # Compare the block numbers
-                if current_block_number - previous_block_number != 1:
-                    raise ValueError(f"Block number difference is not 1, {current_block_number} - {previous_block_number}. skipped block : {previous_block_number + 1}")
-            
-            # Drop the table if it exists
-            cursor.execute('DROP TABLE IF EXISTS current_block_number')
-            
-            # Create the table again
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS current_block_number (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                current_block_number TEXT
-            )
-            ''')
-            
-            # Insert the new block number
-            cursor.execute('''
-            INSERT INTO current_block_number (current_block_number)
-            VALUES (?)
-            ''', (current_block_number,))
-            
-            conn.commit()
+        cursor = get_cursor()
+        if cursor:
+            previous_block_number = cursor[0]
+            print(previous_block_number, current_block_number)
+            # Compare the block numbers
+            if report_gaps and current_block_number - previous_block_number > 1:
+                raise ValueError(f"Block number difference is not 1, {current_block_number} - {previous_block_number}. skipped block : {previous_block_number + 1}")
+        return previous_block_number
     except ValueError as ve:
         sentry_sdk.capture_exception(ve)
-        print(f"ValueError in check_update_block_number (observing/observer/observer.py): {ve}")
-        # Continue to update the block number in the database
-        try:
-            with sqlite3.connect(db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('DROP TABLE IF EXISTS current_block_number')
-                cursor.execute('''
-                CREATE TABLE IF NOT EXISTS current_block_number (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    current_block_number TEXT
-                )
-                ''')
-                cursor.execute('''
-                INSERT INTO current_block_number (current_block_number)
-                VALUES (?)
-                ''', (current_block_number,))
-                conn.commit()
-        except sqlite3.Error as e:
-            sentry_sdk.capture_exception(e)
-            print(f"Error in updating block number after ValueError (observing/observer/observer.py): {e}")
+        print(f"ValueError in check_block_number (observing/observer/observer.py): {ve}")
+        return previous_block_number
     except sqlite3.Error as e:
         sentry_sdk.capture_exception(e)
-        print(f"Error in check_update_block_number (observing/observer/observer.py): {e}")
+        print(f"Error in check_block_number (observing/observer/observer.py): {e}")
+        return previous_block_number
 
-def update_validator_coldkey(old_coldkey, new_coldkey):
+def update_validator_coldkey(old_coldkey, new_coldkey, undo=None):
     """
     Updates the coldkey of a validator in the database.
     
     Parameters:
     old_coldkey (str): The old coldkey of the validator.
     new_coldkey (str): The new coldkey of the validator.
+    undo (list): If given, a callable that reverts the update is appended to it.
     """
-    db_path = 'DB/db.sqlite3'
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('UPDATE validators SET cold_key = ? WHERE cold_key = ?', (new_coldkey, old_coldkey))
-        conn.commit()
+        with transaction() as conn:
+            ids = [row[0] for row in conn.execute('SELECT id FROM validators WHERE cold_key = ?', (to_db_key(old_coldkey),))]
+            conn.execute('UPDATE validators SET cold_key = ? WHERE cold_key = ?', (to_db_key(new_coldkey), to_db_key(old_coldkey)))
+        if undo is not None:
+            undo.append(lambda: restore_validator_coldkey(ids, old_coldkey))
+        refresh_index()
         print("Coldkey updated successfully.")
     except sqlite3.Error as e:
-        print(f"Database error: {e}")
-    finally:
-        if conn:
-            conn.close()
+        sentry_sdk.capture_exception(e)
+        print(f"Database error in update_validator_coldkey (observing/observer/observer.py): {e}")
 
-def update_owner_coldkey(net_uid, new_coldkey):
+def restore_validator_coldkey(ids, coldkey):
+    """Sets the coldkey of the validator rows with the given ids back to coldkey (undoes update_validator_coldkey())."""
+    try:
+        with transaction() as conn:
+            conn.executemany('UPDATE validators SET cold_key = ? WHERE id = ?', [(to_db_key(coldkey), row_id) for row_id in ids])
+        refresh_index()
+    except sqlite3.Error as e:
+        sentry_sdk.capture_exception(e)
+        print(f"Database error in restore_validator_coldkey (observing/observer/observer.py): {e}")
+
+def _get_owner_rows(conn, net_uid):
+    return conn.execute('SELECT id, net_uid, owner_coldkey FROM owners WHERE net_uid = ?', (net_uid,)).fetchall()
+
+def restore_owner(net_uid, rows):
+    """Puts back the owner rows of a subnet as they were before a change (undoes the owner updates below)."""
+    try:
+        with transaction() as conn:
+            conn.execute('DELETE FROM owners WHERE net_uid = ?', (net_uid,))
+            conn.executemany('INSERT INTO owners (id, net_uid, owner_coldkey) VALUES (?, ?, ?)', rows)
+        refresh_index()
+    except sqlite3.Error as e:
+        sentry_sdk.capture_exception(e)
+        print(f"Database error in restore_owner (observing/observer/observer.py): {e}")
+
+def update_owner_coldkey(net_uid, new_coldkey, undo=None):
     """
     Updates the coldkey of an owner in the database.
     
     Parameters:
-    net_uid (str): The net_uid of the owner.
+    net_uid (int): The net_uid of the owner.
     new_coldkey (str): The new coldkey of the owner.
+    undo (list): If given, a callable that reverts the update is appended to it.
     """
-    db_path = 'DB/db.sqlite3'
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('UPDATE owners SET owner_coldkey = ? WHERE net_uid = ?', (new_coldkey, net_uid))
-        conn.commit()
+        with transaction() as conn:
+            rows = _get_owner_rows(conn, net_uid)
+            conn.execute('UPDATE owners SET owner_coldkey = ? WHERE net_uid = ?', (to_db_key(new_coldkey), net_uid))
+        if undo is not None:
+            undo.append(lambda: restore_owner(net_uid, rows))
+        refresh_index()
         print("Owner coldkey updated successfully.")
     except sqlite3.Error as e:
-        print(f"Database error: {e}")
-    finally:
-        if conn:
-            conn.close()
+        sentry_sdk.capture_exception(e)
+        print(f"Database error in update_owner_coldkey (observing/observer/observer.py): {e}")
     print("Owner coldkey data has updated with new coldkey.(one element)")
 
+def remove_owner(net_uid, undo=None):
+    """Deletes the owner row of a dissolved subnet. Returns True on success. undo works as in update_owner_coldkey()."""
+    try:
+        with transaction() as conn:
+            rows = _get_owner_rows(conn, net_uid)
+            conn.execute('DELETE FROM owners WHERE net_uid = ?', (net_uid,))
+        if undo is not None:
+            undo.append(lambda: restore_owner(net_uid, rows))
+        refresh_index()
+        print(f"Owner of subnet {net_uid} removed.")
+        return True
+    except sqlite3.Error as e:
+        sentry_sdk.capture_exception(e)
+        print(f"Database error in remove_owner (observing/observer/observer.py): {e}")
+        return False
+
+def upsert_owner(net_uid, owner_coldkey, undo=None):
+    """
+    Stores the owner coldkey of one subnet, replacing the previous owner row. Returns True on success.
+    undo works as in update_owner_coldkey().
+    """
+    try:
+        with transaction() as conn:
+            rows = _get_owner_rows(conn, net_uid)
+            conn.execute('DELETE FROM owners WHERE net_uid = ?', (net_uid,))
+            conn.execute('INSERT INTO owners (net_uid, owner_coldkey) VALUES (?, ?)', (net_uid, to_db_key(owner_coldkey)))
+        if undo is not None:
+            undo.append(lambda: restore_owner(net_uid, rows))
+        refresh_index()
+        print(f"Owner of subnet {net_uid} set to {owner_coldkey}.")
+        return True
+    except sqlite3.Error as e:
+        sentry_sdk.capture_exception(e)
+        print(f"Database error in upsert_owner (observing/observer/observer.py): {e}")
+        return False
+
+def fetch_subnet_owner(net_uid, block_hash=None):
+    """Reads the owner coldkey of a subnet from chain storage (SubtensorModule.SubnetOwner). Returns None on failure."""
+    try:
+        owner = get_chain_client().query('SubtensorModule', 'SubnetOwner', [net_uid], block_hash=block_hash)
+        return owner.value if owner is not None else None
+    except Exception as e:
+        sentry_sdk.capture_exception(e)
+        print(f"Exception in fetch_subnet_owner (observing/observer/observer.py): {e}")
+        return None
+
+def get_event_netuid(event):
+    """Returns the netuid of a NetworkRemoved / NetworkAdded event (its first attribute)."""
+    attributes = event.value.get('attributes')
+    if isinstance(attributes, (list, tuple)):
+        attributes = attributes[0]
+    return int(attributes)
+
 def process_vote(extrinsic):
     """
     Extracts specific parameters from the extrinsic data.
@@ -502,60 +501,242 @@ def process_vote(extrinsic):
         print(f"Exception in process_vote (observing/observer/observer.py): {e}")
         return None, None, None, None
 
-def check_events(events, swap_event, dissolve_event):
+@register_extrinsic_detector('SubtensorModule', 'schedule_swap_coldkey', 'schedule_swap_coldkey', 'coldkey_swap')
+def report_schedule_swap_coldkey(context, idx, extrinsic):
+    """Generates the report of one schedule_swap_coldkey extrinsic."""
+    extrinsic_events, extrinsic_success = get_extrinsic_result(context['block_index'], idx)
+    old_coldkey, new_coldkey, execution_block = process_swap_extrinsics(extrinsic_events) if extrinsic_success else (None, None, None)
+    validator_name, validator_hotkey, check_validator = get_validator_name(old_coldkey)
+    link = f"https://taostats.io/validators/{validator_hotkey}"
+    original_coldkey = old_coldkey
+    if check_validator:
+        if validator_name:
+            old_coldkey = old_coldkey + f"\n(Validator : [{validator_name}]({link}))"
+        else: 
+            old_coldkey = old_coldkey + f"\n(Validator : [no name]({link}))"
+    netuid = get_owner_name(original_coldkey)
+    if netuid:
+        print("netuid", netuid)
+        link = f"https://taostats.io/subnets/{netuid}/metagraph"
+        old_coldkey = f"{old_coldkey}\n([subnet{netuid} owner]({link}))" 
+    details = {
+        "current_block_number": context['current_block_number'],
+        "old_coldkey": old_coldkey,
+        "new_coldkey": new_coldkey,
+        "execution_block": execution_block
+    }
+    return generate_report("📅 __ NEW SCHEDULE_SWAP_COLDKEY DETECTED __ 📅", extrinsic_success, details, context['block_index']['timestamp'])
+
+@register_extrinsic_detector('SubtensorModule', 'schedule_dissolve_network', 'schedule_dissolve_network', 'dissolve_network')
+def report_schedule_dissolve_network(context, idx, extrinsic):
+    """Generates the report of one schedule_dissolve_network extrinsic."""
+    extrinsic_events, extrinsic_success = get_extrinsic_result(context['block_index'], idx)
+    netuid, owner_coldkey, execution_block = process_dissolve_extrinsics(extrinsic_events) if extrinsic_success else (None, None, None)
+    link = f"https://taostats.io/subnets/{netuid}/metagraph"
+    netuid = f"[{netuid}]({link})"
+    details = {
+        "current_block_number": context['current_block_number'],
+        "netuid": netuid,
+        "owner_coldkey": owner_coldkey,
+        "execution_block": execution_block
+    }
+    return generate_report("⏳ __SCHEDULE_NETWORK_DISSOLVE DETECTED__ ⏳", extrinsic_success, details, context['block_index']['timestamp'])
+
+@register_extrinsic_detector('SubtensorModule', 'vote', 'vote', 'coldkey_swap')
+def report_vote(context, idx, extrinsic):
+    """Generates the report of one vote extrinsic."""
+    extrinsic_events, extrinsic_success = get_extrinsic_result(context['block_index'], idx)
+    hotkey, proposal, approve, index = process_vote(extrinsic)
+    validator_name, validator_coldkey, check_validator = get_validator_name(None, hotkey)
+    link = f"https://taostats.io/validators/{hotkey}"
+    if check_validator:
+        if validator_name:
+            hotkey = hotkey + f"\n([Validator : {validator_name}]({link}))"
+        else: 
+            hotkey = hotkey + f"\n([Validator : no name]({link}))"
+    details = {
+        "current_block_number": context['current_block_number'],
+        "hotkey": hotkey,
+        "proposal": proposal,
+        "index": index,
+        "approve": approve,
+    }
+    return generate_vote_report("🗳️ __ NEW VOTE DETECTED __ 🗳️", extrinsic_success, details, context['block_index']['timestamp'])
+
+@register_event_detector('ColdkeySwapped', 'coldkey_swapped', 'coldkey_swap')
+def report_coldkey_swapped(context, event):
+    """Generates the report of one ColdkeySwapped event and moves the swapped coldkey in the database."""
+    swapped_old_coldkey = event.value['attributes'].get('old_coldkey')
+    swapped_new_coldkey = event.value['attributes'].get('new_coldkey')
+    if not swapped_old_coldkey:
+        return None
+    apply_updates = context['apply_updates']
+    validator_name, validator_hotkey, check_validator = get_validator_name(swapped_old_coldkey)
+    link = f"https://taostats.io/validators/{validator_hotkey}"
+    original_coldkey = swapped_old_coldkey
+    if check_validator:  
+        if apply_updates:
+            update_validator_coldkey(swapped_old_coldkey, swapped_new_coldkey, context['undo'])
+        if validator_name:
+            swapped_old_coldkey = swapped_old_coldkey + f"\n(Validator : [{validator_name}]({link}))"
+        else: 
+            swapped_old_coldkey = swapped_old_coldkey + f"\n(Validator : [no name]({link}))" 
+    netuid = get_owner_name(original_coldkey)
+    if netuid:
+        if apply_updates:
+            update_owner_coldkey(netuid, swapped_new_coldkey, context['undo'])
+        print("netuid", netuid)
+        link = f"https://taostats.io/subnets/{netuid}/metagraph"
+        swapped_old_coldkey = f"{swapped_old_coldkey}\n([subnet{netuid} owner]({link}))"       
+    details = {
+        "current_block_number": context['current_block_number'],
+        "old_coldkey": swapped_old_coldkey,
+        "new_coldkey": swapped_new_coldkey,
+    }
+    return generate_report(" __😍 COLDKEY SWAPPED 😍__ ", True, details, context['block_index']['timestamp'])
+
+@register_event_detector('NetworkRemoved', 'network_dissolved', 'dissolve_network')
+def report_network_removed(context, event):
+    """
+    Generates the report of one NetworkRemoved event and removes the subnet's owner row.
+    A full owner table refresh is requested only if the row cannot be removed.
+    """
+    if context['apply_updates'] and not remove_owner(get_event_netuid(event), context['undo']):
+        context['should_update_owner_table'] = True
+    details = {
+        "current_block_number": context['current_block_number'],
+        "netuid": event.value.get('attributes'),
+    }
+    return generate_dissolved_netword("😯 __ NETWORK DESSOLVED __ 😯", details, context['block_index']['timestamp'])
+
+@register_event_detector('NetworkAdded', 'network_added', 'dissolve_network')
+def update_network_added(context, event):
     """
-    Checks for specific events in the list of events.
+    Stores the owner of a newly registered subnet, read from chain storage at this block.
+    Requests a full owner table refresh if the owner cannot be read. Produces no report.
     """
-    try:
-        swapped_old_coldkey, swapped_new_coldkey, dissolved_network_uid = None, None, None
-        for idx, event in enumerate(events):
-            event_value = getattr(event, 'value', None)
-            if event_value and event_value.get('event_id') == swap_event:
-                swapped_old_coldkey = event_value['attributes'].get('old_coldkey')
-                swapped_new_coldkey = event_value['attributes'].get('new_coldkey')
-                
-            elif event_value and event_value.get('event_id') == dissolve_event:
-                dissolved_network_uid = event_value.get('attributes')
-
-        return swapped_old_coldkey, swapped_new_coldkey, dissolved_network_uid
-    except Exception as e:
-        sentry_sdk.capture_exception(e)
-        print(f"Exception in check_events (observing/observer/observer.py): {e}")
-        return None, None, None
+    if not context['apply_updates']:
+        return None
+    net_uid = get_event_netuid(event)
+    owner_coldkey = fetch_subnet_owner(net_uid, context['block_hash'])
+    if not owner_coldkey or not upsert_owner(net_uid, owner_coldkey, context['undo']):
+        context['should_update_owner_table'] = True
+    return None
 
-def find_dissolve_subnet(block, events):
+def analyze_block(current_block_number, block, events, apply_updates=True, undo=None):
     """
-    Finds and processes a scheduled network dissolve in the given block number.
+    Runs the registered detectors on an already fetched block, generating one report for every
+    matching extrinsic and event.
+    If apply_updates is False, swapped coldkeys are reported but not written to the database (used for historical scans).
+    If undo is a list, a callable reverting each database update of the block is appended to it.
+    Returns (reports, should_update_owner_table), where reports is a list of {'name', 'channel', 'report'} dicts.
     """
     try:
-        idx = check_extrinsic(block['extrinsics'], 'schedule_dissolve_network', 'SubtensorModule')
-        if idx >= 0:
-            time_stamp = extract_block_timestamp(block['extrinsics'])
-            extrinsic_events, extrinsic_success = check_success(events, idx)
-            netuid, owner_coldkey, execution_block = process_dissolve_extrinsics(extrinsic_events) if extrinsic_success else (None, None, None)
-            return idx, extrinsic_success, netuid, owner_coldkey, execution_block, time_stamp
-        return -1, False, None, None, None, None
+        if block is None or events is None:
+            return [], False
+        
+        # Index the extrinsics and events of the block in one pass; the detectors only query the index
+        context = {
+            'current_block_number': current_block_number,
+            'block_index': index_block(block['extrinsics'], events),
+            'block_hash': block.get('header', {}).get('hash'),
+            'apply_updates': apply_updates,
+            'should_update_owner_table': False,
+            'undo': undo,
+        }
+        reports = run_detectors(context, block['extrinsics'])
+        return reports, context['should_update_owner_table']
     except Exception as e:
         sentry_sdk.capture_exception(e)
-        print(f"Exception in find_dissolve_subnet (observing/observer/observer.py): {e}")
-        return -1, False, None, None, None, None
+        print(f"Exception in analyze_block (observing/observer/observer.py): {e}")
+        return [], False
+
+def apply_block(tracker, block_number, block, events, report_handler, events_substrate=None):
+    """
+    Reports one fetched block through the reorg window of tracker.
+    Blocks that were already reported are skipped. If the block does not build on the recorded chain, the reports
+    of the orphaned blocks are retracted, their database updates are reverted, and the canonical blocks at those
+    heights are reported first.
+    """
+    if block is None or events is None:
+        advance_cursor(block_number, status='skipped')
+        report_handler(([], False))
+        return
+    chain = get_chain_client()
+    block_hash = block['header']['hash']
+    parent_hash = block['header'].get('parentHash')
+    if tracker.is_duplicate(block_number, block_hash):
+        print(f"Block {block_number} ({block_hash}) was already reported, skipping")
+        return
 
-def find_swap_coldkey(block, events):
+    retracted = tracker.find_retracted(block_number, parent_hash, lambda number: chain.get_block_hash(block_id=number))
+    if retracted:
+        print(f"Reorg detected at block {block_number}, retracting blocks {retracted}")
+        report_handler((tracker.retract(retracted), False))
+        for number in retracted:
+            if number < block_number:
+                canonical_block, canonical_events = fetch_block_data(chain, number, events_substrate)
+                apply_block(tracker, number, canonical_block, canonical_events, report_handler, events_substrate)
+
+    undo = []
+    reports, should_update_owner_table = analyze_block(block_number, block, events, undo=undo)
+    tracker.record(block_number, block_hash, parent_hash, reports, undo)
+    advance_cursor(block_number, block_hash)
+    report_handler((reports, should_update_owner_table))
+
+def backfill_blocks(block_numbers, report_handler, workers=None, tracker=None):
+    """
+    Processes skipped blocks through the same pipeline as new blocks. The blocks are fetched by a pool of
+    BACKFILL_WORKERS concurrent fetchers, but their reports are passed to report_handler in block order.
+    With a tracker, the blocks also go through its reorg window and move the cursor (see apply_block()).
+    Without one, they are only logged as processed, and blocks that still cannot be fetched are left as gaps.
+    """
+    if workers is None:
+        workers = int(os.getenv('BACKFILL_WORKERS', 4))
+    for block_number, (block, events) in fetch_blocks(block_numbers, setup_substrate_interface, fetch_block_data, workers):
+        if tracker is not None:
+            apply_block(tracker, block_number, block, events, report_handler)
+        elif block is not None and events is not None:
+            report_handler(analyze_block(block_number, block, events))
+            mark_block(block_number)
+
+def backfill_gap(tracker, previous_block_number, current_block_number, report_handler):
+    """
+    Processes the blocks after previous_block_number up to current_block_number through the reorg window of tracker.
+    At most BACKFILL_MAX_BLOCKS blocks are processed. The older part of a longer gap would replay old alerts and
+    coldkey swaps, so it is only reported, to be audited with scan.py.
+    """
+    start_block = max(previous_block_number + 1, current_block_number - get_backfill_limit() + 1)
+    if start_block > previous_block_number + 1:
+        message = (f"Not backfilling blocks {previous_block_number + 1} - {start_block - 1}, the gap is over BACKFILL_MAX_BLOCKS; "
+                   f"audit them with: python scan.py --from {previous_block_number + 1} --to {start_block - 1}")
+        sentry_sdk.capture_message(message)
+        print(message)
+    print(f"Backfilling {current_block_number - start_block} skipped blocks: {start_block} - {current_block_number - 1}")
+    # The new block joins the backfill window, so it is prefetched while the skipped blocks are analysed
+    backfill_blocks(range(start_block, current_block_number + 1), report_handler, tracker=tracker)
+
+def retry_skipped_blocks(current_block_number, report_handler):
     """
-    Finds and processes a scheduled coldkey swap in the given block number.
+    Processes the blocks among the last BACKFILL_MAX_BLOCKS that were skipped or never processed (see get_gaps()) again.
+    They are reported outside the reorg window and do not move the cursor.
+    The window never starts before the first logged block: older blocks were handled before block_ranges existed
+    (or before this database was used), and replaying them would post their alerts again.
     """
     try:
-        idx = check_extrinsic(block['extrinsics'], 'schedule_swap_coldkey', 'SubtensorModule')
-        if idx >= 0:
-            time_stamp = extract_block_timestamp(block['extrinsics'])
-            extrinsic_events, extrinsic_success = check_success(events, idx)
-            old_coldkey, new_coldkey, execution_block = process_swap_extrinsics(extrinsic_events) if extrinsic_success else (None, None, None)
-            return idx, extrinsic_success, new_coldkey, old_coldkey, execution_block, time_stamp
-        return -1, False, None, None, None, None
-    except Exception as e:
+        first_logged_block = get_logged_extent()[0]
+        if first_logged_block is None:
+            return
+        from_block = max(current_block_number - get_backfill_limit() + 1, first_logged_block)
+        gaps = get_gaps(from_block, current_block_number - 1)
+    except sqlite3.Error as e:
         sentry_sdk.capture_exception(e)
-        print(f"Exception in find_swap_coldkey (observing/observer/observer.py): {e}")
-        return -1, False, None, None, None, None
+        print(f"Error in retry_skipped_blocks (observing/observer/observer.py): {e}")
+        return
+    block_numbers = [block_number for start_block, end_block in gaps for block_number in range(start_block, end_block + 1)]
+    if block_numbers:
+        print(f"Retrying {len(block_numbers)} skipped blocks in {len(gaps)} ranges")
+        backfill_blocks(block_numbers, report_handler)
 
 def observer_block():
     """
@@ -565,10 +746,11 @@ def observer_block():
     init_sentry()
     
     try:
-        substrate = setup_substrate_interface()
-        current_block_number = bt.subtensor().get_current_block()
+        # One connection for the head number and the block itself
+        chain = get_chain_client()
+        current_block_number = chain.get_head_number()
         
-        check_update_block_number(current_block_number)
+        check_block_number(current_block_number)
         
         #block numbers for testing
         # current_block_number = 3941423  # schdule swap coldkey
@@ -577,122 +759,100 @@ def observer_block():
         # current_block_number = 3913258  # dissolved network
         # current_block_number = 3948498  # coldkey swapped
         
-        block, events = get_block_data(substrate, current_block_number)
-        schedule_swap_coldkey_report, schedule_dissolve_subnet_report, vote_report, dissloved_subnet_resport, swapped_coldkey_report = None, None, None, None, None
-        should_update_owner_table = False
-        
-        # Check for extrinsics related to scheduled coldkey swap and schedule network dissolve
-        schedule_swap_coldkey_idx, schedule_dissolve_network_idx, vote_idx = check_extrinsic(block['extrinsics'], 'schedule_swap_coldkey', 'schedule_dissolve_network', 'vote', 'SubtensorModule')
-        # Check for events related to coldkey swapped and network dissolved
-        swapped_old_coldkey, swapped_new_coldkey, dissolved_network_uid = check_events(events, 'ColdkeySwapped', 'NetworkRemoved')
-        
-        
-        # Check for scheduled coldkey swap
-        if schedule_swap_coldkey_idx >= 0:
-            time_stamp = extract_block_timestamp(block['extrinsics'])
-            extrinsic_events, extrinsic_success = check_success(events, schedule_swap_coldkey_idx)
-            old_coldkey, new_coldkey, execution_block = process_swap_extrinsics(extrinsic_events) if extrinsic_success else (None, None, None)
-            old_coldkey = "5Cyfk5Jjee6uCafjZyUUjtKd7Q4qh1yJ48Ts7bkT9xXaDqe1" #test for schedule validator coldkey swap
-            validator_name, validator_hotkey, check_validator = get_validator_name(old_coldkey)
-            link = f"https://taostats.io/validators/{validator_hotkey}"
-            original_coldkey = old_coldkey
-            if check_validator:
-                if validator_name:
-                    old_coldkey = old_coldkey + f"\n(Validator : [{validator_name}]({link}))"
-                else: 
-                    old_coldkey = old_coldkey + f"\n(Validator : [no name]({link}))"
-            netuid = get_owner_name(original_coldkey)
-            if netuid:
-                print("netuid", netuid)
-                link = f"https://taostats.io/subnets/{netuid}/metagraph"
-                old_coldkey = f"{old_coldkey}\n([subnet{netuid} owner]({link}))" 
-            details = {
-                "current_block_number": current_block_number,
-                "old_coldkey": old_coldkey,
-                "new_coldkey": new_coldkey,
-                "execution_block": execution_block
-            }
-            schedule_swap_coldkey_report = generate_report("📅 __ NEW SCHEDULE_SWAP_COLDKEY DETECTED __ 📅", extrinsic_success, details, time_stamp)
-
-
-        # Check for scheduled network dissolve
-        if schedule_dissolve_network_idx >= 0:
-            time_stamp = extract_block_timestamp(block['extrinsics'])
-            extrinsic_events, extrinsic_success = check_success(events, schedule_dissolve_network_idx)
-            netuid, owner_coldkey, execution_block = process_dissolve_extrinsics(extrinsic_events) if extrinsic_success else (None, None, None)
-            link = f"https://taostats.io/subnets/{netuid}/metagraph"
-            netuid = f"[{netuid}]({link})"
-            details = {
-                "current_block_number": current_block_number,
-                "netuid": netuid,
-                "owner_coldkey": owner_coldkey,
-                "execution_block": execution_block
-            }
-            schedule_dissolve_subnet_report = generate_report("⏳ __SCHEDULE_NETWORK_DISSOLVE DETECTED__ ⏳", extrinsic_success, details, time_stamp)
-
-
-        # Check for vote
-        if vote_idx >= 0:
-            time_stamp = extract_block_timestamp(block['extrinsics'])
-            extrinsic_events, extrinsic_success = check_success(events, vote_idx)
-            hotkey, proposal, approve, index = process_vote(block['extrinsics'][vote_idx])
-            # hotkey = "5HNQURvmjjYhTSksi8Wfsw676b4owGwfLR2BFAQzG7H3HhYf" #test for validator vote
-            validator_name, validator_coldkey, check_validator = get_validator_name(None, hotkey)
-            link = f"https://taostats.io/validators/{hotkey}"
-            if check_validator:
-                if validator_name:
-                    hotkey = hotkey + f"\n([Validator : {validator_name}]({link}))"
-                else: 
-                    hotkey = hotkey + f"\n([Validator : no name]({link}))"
-            details = {
-                "current_block_number": current_block_number,
-                "hotkey": hotkey,
-                "proposal": proposal,
-                "index": index,
-                "approve": approve,
-            }
-            vote_report = generate_vote_report("🗳️ __ NEW VOTE DETECTED __ 🗳️", extrinsic_success, details, time_stamp)
-        
-        
-        # Check for coldkey swapped
-        if swapped_old_coldkey:
-            swapped_old_coldkey = "5Cyfk5Jjee6uCafjZyUUjtKd7Q4qh1yJ48Ts7bkT9xXaDqe1" #test for validator coldkey swapped
-            time_stamp = extract_block_timestamp(block['extrinsics'])
-            validator_name, validator_hotkey, check_validator = get_validator_name(swapped_old_coldkey)
-            link = f"https://taostats.io/validators/{validator_hotkey}"
-            original_coldkey = swapped_old_coldkey
-            if check_validator:  
-                update_validator_coldkey(swapped_old_coldkey, swapped_new_coldkey)
-                if validator_name:
-                    swapped_old_coldkey = swapped_old_coldkey + f"\n(Validator : [{validator_name}]({link}))"
-                else: 
-                    swapped_old_coldkey = swapped_old_coldkey + f"\n(Validator : [no name]({link}))" 
-            netuid = get_owner_name(original_coldkey)
-            if netuid:
-                update_owner_coldkey(netuid, swapped_new_coldkey)
-                print("netuid", netuid)
-                link = f"https://taostats.io/subnets/{netuid}/metagraph"
-                swapped_old_coldkey = f"{swapped_old_coldkey}\n([subnet{netuid} owner]({link}))"       
-            details = {
-                "current_block_number": current_block_number,
-                "old_coldkey": swapped_old_coldkey,
-                "new_coldkey": swapped_new_coldkey,
-            }
-            swapped_coldkey_report = generate_report(" __😍 COLDKEY SWAPPED 😍__ ", True, details, time_stamp)
-            
-        
-        #Check for dissolved network
-        if dissolved_network_uid:
-            time_stamp = extract_block_timestamp(block['extrinsics'])
-            details = {
-                "current_block_number": current_block_number,
-                "netuid": dissolved_network_uid,
-            }
-            dissloved_subnet_resport = generate_dissolved_netword("😯 __ NETWORK DESSOLVED __ 😯", details, time_stamp)
-            should_update_owner_table = True
-
-        return schedule_swap_coldkey_report, schedule_dissolve_subnet_report, vote_report, dissloved_subnet_resport, swapped_coldkey_report, should_update_owner_table
+        block, events = fetch_block_data(chain, current_block_number)
+        result = analyze_block(current_block_number, block, events)
+        if block is None or events is None:
+            advance_cursor(current_block_number, status='skipped')
+        else:
+            advance_cursor(current_block_number, block['header']['hash'])
+        return result
     except Exception as e:
         sentry_sdk.capture_exception(e)
         print(f"Exception in observer_block (observing/observer/observer.py): {e}")
-        return None, None, None, None, None, False
+        return [], False
+
+def new_tracker(window_size):
+    """
+    Returns a BlockTracker seeded with the cursor, so that after a restart the last handled block is known by
+    hash and is not reported again.
+    """
+    tracker = BlockTracker(window_size)
+    cursor = get_cursor()
+    if cursor and cursor[1]:
+        tracker.record(cursor[0], cursor[1], None, [])
+    return tracker
+
+def watch_subscription(chain, state, timeout):
+    """
+    Aborts the connection of chain if no header arrived for timeout seconds while none was being handled.
+    On a half-open socket the subscription would otherwise wait forever without an error; aborting it makes
+    the subscription fail, so it is set up again on a new connection.
+    """
+    while True:
+        time.sleep(max(1, timeout / 4))
+        if state['busy'] or time.monotonic() - state['last_header'] < timeout:
+            continue
+        message = f"No block header for {timeout} seconds, reconnecting the subscription"
+        sentry_sdk.capture_message(message)
+        print(message)
+        state['last_header'] = time.monotonic()
+        chain.abort()
+
+def observe_new_blocks(report_handler, reconnect_delay=5):
+    """
+    Subscribes to new block headers on the shared chain client, running the block checks on each
+    header as it arrives and passing the resulting reports to report_handler.
+    Which heads are followed and how reorgs are handled depends on FINALITY_MODE (see observing/observer/finality.py).
+    Reconnects after reconnect_delay seconds if the subscription drops, or if the setup (e.g. reading the cursor)
+    fails, and if no header arrives for SUBSCRIPTION_TIMEOUT seconds (default 120, see watch_subscription()).
+    Never returns; an invalid FINALITY_MODE raises ValueError before anything is observed.
+    """
+    finality_mode, confirmations, window_size = get_finality_settings()
+    retry_interval = int(os.getenv('BACKFILL_RETRY_INTERVAL', 600))
+    chain = get_chain_client()
+    events_chain = get_chain_client('events')
+    tracker = None
+    last_retry = None
+    subscription = {'busy': False, 'last_header': time.monotonic()}
+    threading.Thread(
+        target=watch_subscription,
+        args=(chain, subscription, int(os.getenv('SUBSCRIPTION_TIMEOUT', 120))),
+        name='subscription-watchdog',
+        daemon=True,
+    ).start()
+
+    def subscription_handler(header, update_nr, subscription_id):
+        # A long backfill is not a stalled subscription
+        subscription['busy'] = True
+        try:
+            handle_header(header)
+        finally:
+            subscription['busy'] = False
+            subscription['last_header'] = time.monotonic()
+
+    def handle_header(header):
+        nonlocal last_retry
+        current_block_number = header['header']['number'] - confirmations
+        # Gaps are backfilled below; only the part beyond BACKFILL_MAX_BLOCKS is reported (see backfill_gap())
+        previous_block_number = check_block_number(current_block_number, report_gaps=False)
+        if previous_block_number is not None and current_block_number - previous_block_number > 1:
+            backfill_gap(tracker, previous_block_number, current_block_number, report_handler)
+        else:
+            block, events = fetch_block_data(chain, current_block_number, events_chain)
+            apply_block(tracker, current_block_number, block, events, report_handler, events_chain)
+        # Blocks that could not be fetched are picked up again every BACKFILL_RETRY_INTERVAL seconds
+        if last_retry is None or time.monotonic() - last_retry >= retry_interval:
+            last_retry = time.monotonic()
+            retry_skipped_blocks(current_block_number, report_handler)
+
+    while True:
+        try:
+            if tracker is None:
+                tracker = new_tracker(window_size)
+            subscription['last_header'] = time.monotonic()
+            chain.subscribe_block_headers(subscription_handler, finalized_only=finality_mode == 'finalized')
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            print(f"Exception in observe_new_blocks (observing/observer/observer.py): {e}")
+            chain.reconnect()
+        time.sleep(reconnect_delay)
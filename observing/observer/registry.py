@@ -0,0 +1,104 @@
+import os
+import importlib
+import sentry_sdk
+
+# Detector registry.
+# A detector declares the call (call_module, call_function) or the event_id it watches and the
+# Discord channel its reports go to. All registrations are compiled into one dict, so matching an
+# extrinsic or event against every loaded detector is a single lookup.
+#
+# Extrinsic detectors are called as detector(context, idx, extrinsic), event detectors as
+# detector(context, event). Both return a report (Discord embed) or None. context is a dict with
+# current_block_number, block_index, block_hash, apply_updates, should_update_owner_table, which a
+# detector may set to True, and undo: None, or a list the database writers append their revert callables to.
+#
+# Extra detector modules can be loaded with OBSERVER_PLUGINS="package.module,other.module".
+
+_detectors = []
+_dispatch_table = None
+_plugins_loaded = False
+
+def _register(key, name, channel, detector):
+    global _dispatch_table
+    _detectors.append((key, {'name': name, 'channel': channel, 'detector': detector}))
+    _dispatch_table = None
+    return detector
+
+def register_extrinsic_detector(call_module, call_function, name, channel):
+    """Decorator registering a detector for every extrinsic calling call_module.call_function."""
+    def decorator(detector):
+        return _register(('call', call_module, call_function), name, channel, detector)
+    return decorator
+
+def register_event_detector(event_id, name, channel):
+    """Decorator registering a detector for every event with this event_id."""
+    def decorator(detector):
+        return _register(('event', event_id), name, channel, detector)
+    return decorator
+
+def load_plugins():
+    """Imports the detector modules listed in OBSERVER_PLUGINS once."""
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+    for module_name in filter(None, (name.strip() for name in os.getenv('OBSERVER_PLUGINS', '').split(','))):
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            print(f"Exception in load_plugins (observing/observer/registry.py): {module_name}: {e}")
+
+def get_dispatch_table():
+    """
+    Returns the compiled dispatch table:
+    ('call', call_module, call_function) or ('event', event_id) -> list of detector entries.
+    """
+    global _dispatch_table
+    if _dispatch_table is None:
+        load_plugins()
+        table = {}
+        for key, entry in _detectors:
+            table.setdefault(key, []).append(entry)
+        _dispatch_table = table
+    return _dispatch_table
+
+def get_watched_calls():
+    """Returns the (call_module, call_function) pairs that have a detector, plus Timestamp.set for the block timestamp."""
+    calls = {(key[1], key[2]) for key in get_dispatch_table() if key[0] == 'call'}
+    calls.add(('Timestamp', 'set'))
+    return calls
+
+def run_detectors(context, extrinsics):
+    """
+    Runs every registered detector on the indexed block in context.
+    Returns a list of {'name', 'channel', 'report'} dicts: extrinsic reports in block order, then event reports
+    in block order. Event detectors run in the order of the events, since their database updates can depend
+    on each other (e.g. NetworkRemoved and NetworkAdded of the same netuid).
+    """
+    table = get_dispatch_table()
+    block_index = context['block_index']
+
+    matches = []
+    for (call_module, call_function), idxs in block_index['calls'].items():
+        entries = table.get(('call', call_module, call_function))
+        if entries:
+            matches.extend((idx, entry) for idx in idxs for entry in entries)
+    matches.sort(key=lambda match: match[0])
+
+    reports = []
+    for idx, entry in matches:
+        reports.append(_run(entry, context, idx, extrinsics[idx]))
+    for event_id, event in block_index['events']:
+        for entry in table.get(('event', event_id), []):
+            reports.append(_run(entry, context, event))
+    return [report for report in reports if report['report']]
+
+def _run(entry, context, *args):
+    try:
+        report = entry['detector'](context, *args)
+    except Exception as e:
+        sentry_sdk.capture_exception(e)
+        print(f"Exception in detector {entry['name']} (observing/observer/registry.py): {e}")
+        report = None
+    return {'name': entry['name'], 'channel': entry['channel'], 'report': report}
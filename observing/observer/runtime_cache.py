@@ -0,0 +1,45 @@
+import os
+from scalecodec.base import ScaleBytes
+from substrateinterface.base import SubstrateInterface
+
+# On-disk cache of the runtime metadata.
+# Without it every process start downloads the chain metadata again. Metadata is stored as the raw SCALE hex
+# returned by state_getMetadata, one file per chain (genesis hash) and spec_version, so a runtime upgrade is
+# the only thing that triggers a new download and two networks never share a file.
+
+def get_cache_dir():
+    cache_dir = os.getenv('RUNTIME_CACHE_DIR', 'DB/runtime_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def _write_atomic(path, content):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+class CachedSubstrateInterface(SubstrateInterface):
+    """SubstrateInterface that reads the runtime metadata from the disk cache, keyed by genesis hash and spec_version."""
+
+    _genesis_hash = None
+
+    def get_genesis_hash(self):
+        if self._genesis_hash is None:
+            self._genesis_hash = self.rpc_request('chain_getBlockHash', [0])['result']
+        return self._genesis_hash
+
+    def get_block_metadata(self, block_hash=None, decode=True):
+        if not decode or self.runtime_version is None:
+            return super().get_block_metadata(block_hash=block_hash, decode=decode)
+
+        metadata_path = os.path.join(get_cache_dir(), f"metadata_{self.get_genesis_hash()}_{self.runtime_version}.hex")
+        try:
+            with open(metadata_path, 'r') as f:
+                metadata_hex = f.read()
+        except FileNotFoundError:
+            metadata_hex = super().get_block_metadata(block_hash=block_hash, decode=False)['result']
+            _write_atomic(metadata_path, metadata_hex)
+
+        metadata = self.runtime_config.create_scale_object('MetadataVersioned', data=ScaleBytes(metadata_hex))
+        metadata.decode()
+        return metadata
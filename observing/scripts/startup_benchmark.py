@@ -0,0 +1,58 @@
+# Cold-start benchmark for the entry points.
+# Imports each entry module in a fresh interpreter several times and fails if the median import time
+# goes over the budget, or if a module that should load lazily is imported at startup.
+#
+# Usage: python observing/scripts/startup_benchmark.py [--runs 5] [--budget-ms 1500]
+# (run from the repository root)
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ENTRY_MODULES = ['run', 'main']
+# Modules that must not be loaded just by importing an entry point
+LAZY_MODULES = ['bittensor', 'observing.utils.get_coldkeys', 'observing.observer.observer', 'observing.bot.bot']
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+def measure(module, runs):
+    """Returns (list of import times in ms, lazy modules loaded) for module, each run in a new interpreter."""
+    timings, loaded = [], set()
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE.format(module=module, lazy=LAZY_MODULES)],
+            capture_output=True, text=True, check=True,
+        )
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        timings.append(probe['ms'])
+        loaded.update(probe['loaded'])
+    return timings, loaded
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure the cold-start import time of the entry points.")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per entry module.")
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('STARTUP_BUDGET_MS', 1500)), help="Maximum median import time per entry module.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+
+    args = parse_args()
+    failed = False
+    for module in ENTRY_MODULES:
+        timings, loaded = measure(module, args.runs)
+        median = statistics.median(timings)
+        status = 'OK' if median <= args.budget_ms and not loaded else 'FAIL'
+        print(f"{status} import {module}: median {median:.1f} ms, min {min(timings):.1f} ms, budget {args.budget_ms:.0f} ms")
+        if loaded:
+            print(f"    loaded eagerly: {', '.join(sorted(loaded))}")
+        failed = failed or status == 'FAIL'
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,97 @@
+import sqlite3
+import threading
+import sentry_sdk
+from observing.utils.storage import connection
+from observing.utils.account_keys import to_db_key, from_db_key
+
+# In-memory view of the validators and owners tables.
+# The index is built once and replaced as a whole by refresh_index(), so readers always see
+# either the old or the new dataset, never a partially loaded one. Every lookup first compares the change
+# counters of the two tables (table_versions) with the ones the index was built from, so refreshes written
+# by another process (e.g. python -m observing.utils.get_coldkeys, or another container) are picked up too.
+# Keys are held in their stored form (32-byte BLOBs with ACCOUNT_KEY_FORMAT=blob); the lookups below
+# take and return SS58 addresses.
+
+_index = None
+_index_version = None
+_refresh_lock = threading.Lock()
+
+def _empty_index():
+    return {
+        'validators_by_coldkey': {},
+        'validators_by_hotkey': {},
+        'owners_by_coldkey': {},
+        'owners_by_netuid': {},
+    }
+
+def _read_version(conn):
+    return conn.execute("SELECT SUM(version) FROM table_versions WHERE name IN ('validators', 'owners')").fetchone()[0]
+
+def _build_index():
+    """
+    Reads the validators and owners tables and returns (dicts keyed by coldkey, hotkey and netuid, their version).
+    If a key appears in several rows, the first row (lowest id) wins, like the previous SELECT ... LIMIT 1 lookups.
+    """
+    index = _empty_index()
+    with connection() as conn:
+        # Read both tables and their version from one snapshot
+        conn.execute('BEGIN')
+        version = _read_version(conn)
+        for cold_key, hot_key, name in conn.execute('SELECT cold_key, hot_key, name FROM validators ORDER BY id'):
+            index['validators_by_coldkey'].setdefault(cold_key, (name, hot_key))
+            index['validators_by_hotkey'].setdefault(hot_key, (name, cold_key))
+        for net_uid, owner_coldkey in conn.execute('SELECT net_uid, owner_coldkey FROM owners ORDER BY id'):
+            index['owners_by_coldkey'].setdefault(owner_coldkey, net_uid)
+            index['owners_by_netuid'].setdefault(net_uid, owner_coldkey)
+        conn.execute('COMMIT')
+    return index, version
+
+def refresh_index():
+    """
+    Reloads the index from the database and swaps it in atomically.
+    Called after the validators or owners tables are rewritten.
+    """
+    global _index, _index_version
+    with _refresh_lock:
+        try:
+            _index, _index_version = _build_index()
+        except sqlite3.Error as e:
+            sentry_sdk.capture_exception(e)
+            print(f"Database error in refresh_index (observing/utils/account_index.py): {e}")
+            if _index is None:
+                # Keep an empty index so lookups do not hit the database on every call; the next refresh fills it.
+                _index = _empty_index()
+
+def get_index():
+    """Returns the current index, loading it on first use and reloading it if the tables changed since."""
+    if _index is None:
+        refresh_index()
+        return _index
+    try:
+        with connection() as conn:
+            version = _read_version(conn)
+    except sqlite3.Error as e:
+        sentry_sdk.capture_exception(e)
+        print(f"Database error in get_index (observing/utils/account_index.py): {e}")
+        return _index
+    if version != _index_version:
+        refresh_index()
+    return _index
+
+def find_validator_by_coldkey(coldkey):
+    """Returns (name, hot_key) of the validator with this coldkey, or None."""
+    validator = get_index()['validators_by_coldkey'].get(to_db_key(coldkey))
+    return (validator[0], from_db_key(validator[1])) if validator else None
+
+def find_validator_by_hotkey(hotkey):
+    """Returns (name, cold_key) of the validator with this hotkey, or None."""
+    validator = get_index()['validators_by_hotkey'].get(to_db_key(hotkey))
+    return (validator[0], from_db_key(validator[1])) if validator else None
+
+def find_owner_netuid(coldkey):
+    """Returns the net_uid owned by this coldkey, or None."""
+    return get_index()['owners_by_coldkey'].get(to_db_key(coldkey))
+
+def find_owner_coldkey_by_netuid(netuid):
+    """Returns the owner coldkey of this net_uid, or None."""
+    return from_db_key(get_index()['owners_by_netuid'].get(int(netuid)))
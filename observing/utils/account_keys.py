@@ -0,0 +1,96 @@
+import sentry_sdk
+from observing.utils.storage import ACCOUNT_KEY_FORMAT
+
+# Storage format of the account keys in the validators and owners tables.
+# ACCOUNT_KEY_FORMAT=ss58 (default) stores the 48-character SS58 strings. ACCOUNT_KEY_FORMAT=blob stores the
+# raw 32-byte AccountId, so the tables, their indexes and the in-memory account index hold fixed-width bytes;
+# addresses are formatted as SS58 only when a value leaves the storage layer (e.g. to render a report).
+
+def uses_blob_keys():
+    return ACCOUNT_KEY_FORMAT == 'blob'
+
+def to_db_key(address):
+    """Returns the stored form of an SS58 address. Addresses that cannot be decoded are returned unchanged."""
+    if address is None or not uses_blob_keys() or not isinstance(address, str):
+        return address
+    from observing.utils.ss58 import decode_address
+    try:
+        return decode_address(address)
+    except Exception:
+        return address
+
+def from_db_key(value):
+    """Returns the SS58 address of a stored key, whatever format it is stored in."""
+    if isinstance(value, (bytes, bytearray)):
+        from observing.utils.ss58 import encode_address
+        return encode_address(bytes(value))
+    return value
+
+def _convert_column(conn, table, column, convert):
+    """Converts one key column. Returns (number of converted rows, stored values that could not be converted)."""
+    rows = conn.execute(f'SELECT id, {column} FROM {table}').fetchall()
+    updates, failed = [], []
+    for row_id, value in rows:
+        converted = convert(value)
+        if converted is not value:
+            updates.append((converted, row_id))
+        elif uses_blob_keys() and isinstance(value, str):
+            failed.append(value)
+    conn.executemany(f'UPDATE {table} SET {column} = ? WHERE id = ?', updates)
+    return len(updates), failed
+
+KEY_COLUMNS = [('validators', 'cold_key'), ('validators', 'hot_key'), ('owners', 'owner_coldkey')]
+
+def get_converted_format(conn):
+    """Returns the ACCOUNT_KEY_FORMAT the stored keys were last converted to, or None if they never were."""
+    row = conn.execute("SELECT value FROM storage_settings WHERE name = 'account_key_format'").fetchone()
+    return row[0] if row else None
+
+def needs_conversion(conn):
+    """
+    Returns True if the stored keys are not in the configured ACCOUNT_KEY_FORMAT.
+    Once converted, the recorded format decides, so keys that cannot be converted do not trigger a new conversion.
+    """
+    converted_format = get_converted_format(conn)
+    if converted_format is not None:
+        return converted_format != ACCOUNT_KEY_FORMAT
+    stored_type = 'text' if uses_blob_keys() else 'blob'
+    return any(
+        conn.execute(f'SELECT 1 FROM {table} WHERE typeof({column}) = ? LIMIT 1', (stored_type,)).fetchone()
+        for table, column in KEY_COLUMNS
+    )
+
+def convert_account_keys(conn):
+    """
+    Rewrites the stored keys in the configured ACCOUNT_KEY_FORMAT and records that format, in one transaction,
+    then compacts the file. Keys that are not valid SS58 addresses are logged and left as they are.
+    """
+    convert = to_db_key if uses_blob_keys() else from_db_key
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        # Another process may have converted the keys while we waited for the lock
+        if not needs_conversion(conn):
+            conn.rollback()
+            return
+        converted, failed = 0, []
+        for table, column in KEY_COLUMNS:
+            column_converted, column_failed = _convert_column(conn, table, column, convert)
+            converted += column_converted
+            failed += column_failed
+        conn.execute(
+            '''INSERT INTO storage_settings (name, value) VALUES ('account_key_format', ?)
+               ON CONFLICT(name) DO UPDATE SET value = excluded.value''',
+            (ACCOUNT_KEY_FORMAT,),
+        )
+        conn.commit()
+        if converted:
+            conn.execute('VACUUM')
+        print(f"Converted {converted} account keys to {ACCOUNT_KEY_FORMAT} format.")
+        if failed:
+            sentry_sdk.capture_message(f"{len(failed)} stored account keys are not valid SS58 addresses and were left as text, first: {failed[0]!r}")
+            print(f"{len(failed)} account keys could not be converted and were left as text, first: {failed[0]!r}")
+    except Exception as e:
+        if conn.in_transaction:
+            conn.rollback()
+        sentry_sdk.capture_exception(e)
+        print(f"Exception in convert_account_keys (observing/utils/account_keys.py): {e}")
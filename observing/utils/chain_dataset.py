@@ -0,0 +1,76 @@
+import os
+import sentry_sdk
+
+# Chain-native dataset builder (DATASET_SOURCE=chain).
+# Reads the subnet owners and the validators straight from SubtensorModule storage with paged query_map
+# calls instead of the TaoStats API, optionally at a pinned block (DATASET_BLOCK_HASH) so a dataset can be
+# rebuilt reproducibly against a local node. The rows have the same shape as the TaoStats ones, so
+# get_coldkeys.py stores them with the same code.
+
+def get_page_size():
+    return int(os.getenv('DATASET_PAGE_SIZE', 1000))
+
+def get_dataset_chain():
+    """Returns the chain client used by dataset refreshes; its own lane, so it never waits for the block subscription."""
+    from observing.observer.chain import get_chain_client
+    return get_chain_client('dataset')
+
+def _load_map(substrate, storage_function, block_hash):
+    result = substrate.query_map('SubtensorModule', storage_function, block_hash=block_hash, page_size=get_page_size())
+    return [(key.value, value.value) for key, value in result]
+
+def _query_map(chain, storage_function, block_hash):
+    """
+    Returns (key, value) of every entry of a SubtensorModule storage map.
+    query_map() fetches the pages after the first one while the result is iterated, so the whole map is read
+    inside one locked chain call; the heartbeat never shares the connection with a page request.
+    """
+    return chain.run(_load_map, storage_function, block_hash)
+
+def _decode_text(value):
+    if isinstance(value, str) and value.startswith('0x'):
+        return bytes.fromhex(value[2:]).decode('utf-8', errors='replace')
+    if isinstance(value, (bytes, list)):
+        return bytes(value).decode('utf-8', errors='replace')
+    return value
+
+def load_subnet_owners(substrate, block_hash=None):
+    """Returns net_uid -> owner coldkey from SubnetOwner."""
+    return {int(net_uid): coldkey for net_uid, coldkey in _query_map(substrate, 'SubnetOwner', block_hash)}
+
+def load_validators(substrate, block_hash=None, min_stake=1000):
+    """
+    Returns hot_key -> (cold_key, amount) of every delegate hotkey with more than min_stake rao staked,
+    from Delegates, Owner (hotkey -> coldkey) and TotalHotkeyStake.
+    """
+    delegates = {hot_key for hot_key, take in _query_map(substrate, 'Delegates', block_hash)}
+    stakes = {
+        hot_key: int(stake)
+        for hot_key, stake in _query_map(substrate, 'TotalHotkeyStake', block_hash)
+        if hot_key in delegates and int(stake) > min_stake
+    }
+    validators = {}
+    for hot_key, cold_key in _query_map(substrate, 'Owner', block_hash):
+        if hot_key in stakes:
+            validators[hot_key] = (cold_key, stakes[hot_key])
+    return validators
+
+def load_identity_names(substrate, block_hash=None):
+    """
+    Returns coldkey -> display name from the on-chain Identities map.
+    Returns an empty dict if the runtime has no such map, so names then stay as stored.
+    """
+    try:
+        return {
+            coldkey: _decode_text(identity.get('name'))
+            for coldkey, identity in _query_map(substrate, 'Identities', block_hash)
+            if identity and identity.get('name')
+        }
+    except Exception as e:
+        sentry_sdk.capture_exception(e)
+        print(f"Exception in load_identity_names (observing/utils/chain_dataset.py): {e}")
+        return {}
+
+def get_dataset_block_hash():
+    """Returns the pinned DATASET_BLOCK_HASH, or None for the latest block."""
+    return os.getenv('DATASET_BLOCK_HASH') or None
@@ -0,0 +1,100 @@
+import sys
+import time
+import sqlite3
+import sentry_sdk
+from observing.utils.storage import connection, transaction
+
+# Processing cursor of the observer.
+# block_cursor holds one row: the last handled block number, its hash and when it was handled.
+# block_ranges logs which block ranges were processed or skipped (fetch failed). Consecutive blocks with the
+# same status extend the last range, so each block costs one cursor upsert and one range update in a single commit.
+
+def get_cursor():
+    """Returns (block_number, block_hash, processed_at) of the last handled block, or None."""
+    with connection() as conn:
+        return conn.execute('SELECT block_number, block_hash, processed_at FROM block_cursor WHERE id = 1').fetchone()
+
+def _log_block(conn, block_number, status, now):
+    last = conn.execute('SELECT id, end_block, status FROM block_ranges ORDER BY id DESC LIMIT 1').fetchone()
+    if last and last[2] == status and last[1] == block_number - 1:
+        conn.execute('UPDATE block_ranges SET end_block = ?, updated_at = ? WHERE id = ?', (block_number, now, last[0]))
+    else:
+        conn.execute(
+            'INSERT INTO block_ranges (start_block, end_block, status, updated_at) VALUES (?, ?, ?, ?)',
+            (block_number, block_number, status, now),
+        )
+
+def advance_cursor(block_number, block_hash=None, status='processed'):
+    """
+    Moves the cursor to block_number and logs the block as 'processed' or 'skipped', in one transaction.
+
+    Parameters:
+    block_number (int): The block that was just handled.
+    block_hash (str): Its hash, if known.
+    status (str): 'processed', or 'skipped' if the block could not be fetched.
+    """
+    try:
+        now = int(time.time())
+        with transaction() as conn:
+            conn.execute(
+                '''INSERT INTO block_cursor (id, block_number, block_hash, processed_at) VALUES (1, ?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET block_number = excluded.block_number,
+                   block_hash = excluded.block_hash, processed_at = excluded.processed_at''',
+                (block_number, block_hash, now),
+            )
+            _log_block(conn, block_number, status, now)
+    except sqlite3.Error as e:
+        sentry_sdk.capture_exception(e)
+        print(f"Error in advance_cursor (observing/utils/cursor.py): {e}")
+
+def mark_block(block_number, status='processed'):
+    """Logs a block handled out of order (e.g. a skipped block that was retried) without moving the cursor."""
+    try:
+        with transaction() as conn:
+            _log_block(conn, block_number, status, int(time.time()))
+    except sqlite3.Error as e:
+        sentry_sdk.capture_exception(e)
+        print(f"Error in mark_block (observing/utils/cursor.py): {e}")
+
+def get_logged_extent():
+    """Returns (first, last) block number logged in block_ranges, or (None, None) if nothing was logged yet."""
+    with connection() as conn:
+        return conn.execute('SELECT MIN(start_block), MAX(end_block) FROM block_ranges').fetchone()
+
+def get_gaps(from_block=None, to_block=None):
+    """
+    Returns the (start, end) block ranges between from_block and to_block (default: the logged extent) that
+    were skipped or never processed, merged and in ascending order.
+    """
+    with connection() as conn:
+        processed = conn.execute(
+            "SELECT start_block, end_block FROM block_ranges WHERE status = 'processed' ORDER BY start_block"
+        ).fetchall()
+    extent = get_logged_extent()
+    if extent[0] is None:
+        return []
+    from_block = extent[0] if from_block is None else from_block
+    to_block = extent[1] if to_block is None else to_block
+
+    gaps = []
+    next_block = from_block
+    for start_block, end_block in processed:
+        if end_block < next_block:
+            continue
+        if start_block > to_block:
+            break
+        if start_block > next_block:
+            gaps.append((next_block, start_block - 1))
+        next_block = end_block + 1
+    if next_block <= to_block:
+        gaps.append((next_block, to_block))
+    return gaps
+
+if __name__ == "__main__":
+
+    # python -m observing.utils.cursor [from_block to_block]
+    cursor = get_cursor()
+    print(f"Cursor: {cursor}")
+    bounds = [int(arg) for arg in sys.argv[1:3]]
+    for start_block, end_block in get_gaps(*bounds):
+        print(f"Gap: {start_block} - {end_block} ({end_block - start_block + 1} blocks)")
@@ -1,10 +1,15 @@
-import requests
-import sqlite3
-from substrateinterface.utils.ss58 import ss58_encode
+import sys
 import time
 import os
 import sentry_sdk
 from dotenv import load_dotenv
+from observing.utils.storage import connection, transaction, replace_table_rows
+from observing.utils.account_index import refresh_index
+from observing.utils.taostats import get_client
+from observing.utils.name_cache import load_names, store_names
+from observing.utils.ss58 import encode_address, encode_addresses
+from observing.utils.account_keys import to_db_key, from_db_key
+from observing.utils.chain_dataset import get_dataset_chain, get_dataset_block_hash, load_subnet_owners, load_validators, load_identity_names
 # Initialize Sentry
 
 def init_sentry(): 
@@ -28,25 +33,19 @@ def convert_hex_to_ss58(hex_address):
         str: The SS58 encoded address.
     """
     try:
-        if hex_address.startswith('0x'):
-            hex_address = hex_address[2:]
-        
-        address_bytes = bytes.fromhex(hex_address)
-        ss58_address = ss58_encode(address_bytes)
-        
-        return ss58_address
+        return encode_address(hex_address)
     except Exception as e:
         sentry_sdk.capture_exception(e)
         print(f"Exception in convert_hex_to_ss58 (observing/utils/get_coldkeys.py): {e}")
         return None
 
-def fetch_all_validators(url, headers):
+def fetch_all_validators(client):
     """
-    Fetches all validators using pagination.
+    Fetches all validators using pagination. Pages are requested in batches of
+    client.concurrency concurrent requests until an empty page is returned.
     
     Args:
-        url (str): The API endpoint URL.
-        headers (dict): The headers to include in the API request.
+        client (TaoStatsClient): The shared TaoStats client.
     
     Returns:
         list: A list of all validators.
@@ -55,162 +54,223 @@ def fetch_all_validators(url, headers):
         validators = []
         page = 1
         while True:
-            params = {
-                "order": "amount:desc",
-                "page": page
-            }
-            response = requests.get(url, headers=headers, params=params)
-            data = response.json()
-            if not data['validators']:
-                break
-            validators.extend(data['validators'])
-            page += 1
-        return validators
+            pages = list(range(page, page + client.concurrency))
+            results = client.map(lambda p: client.get('/validator', {"order": "amount:desc", "page": p})['validators'], pages)
+            for result in results:
+                if not result:
+                    return validators
+                validators.extend(result)
+            page += len(pages)
     except Exception as e:
         sentry_sdk.capture_exception(e)
         print(f"Exception in fetch_all_validators (observing/utils/get_coldkeys.py): {e}")
         return []
 
+def get_dataset_source():
+    """Returns where the dataset is read from: 'taostats' (default) or 'chain' (DATASET_SOURCE)."""
+    return os.getenv('DATASET_SOURCE', 'taostats')
+
 def find_owner_coldkey():
     """
-    Fetches owner coldkeys and net_uids from the API and saves them to the SQLite database.
+    Fetches owner coldkeys and net_uids from the API (or from chain storage with DATASET_SOURCE=chain)
+    and saves them to the SQLite database.
     """
     
     init_sentry()
-    load_dotenv()
-    TAOSTATS_API_KEY = os.getenv('TAOSTATS_API_KEY')
     
     try:
-        url = "https://api.taostats.io/api/v1/subnet/owner?latest=true"
-        headers = {
-            "accept": "application/json",
-            "Authorization": TAOSTATS_API_KEY
-        }
+        if get_dataset_source() == 'chain':
+            owners = load_subnet_owners(get_dataset_chain(), get_dataset_block_hash())
+            if not owners:
+                print("No subnet owners read from the chain, the owner dataset is not updated.")
+                return
+            net_uids, owner_coldkeys = list(owners.keys()), list(owners.values())
+        else:
+            results = get_client().get('/subnet/owner', {"latest": "true"})
 
-        response = requests.get(url, headers=headers)
-        results = response.json()
+            net_uids = [owner['subnet_id'] for owner in results['subnet_owners']]
+            owner_coldkeys = encode_addresses([owner['owner'] for owner in results['subnet_owners']])
 
-        owner_coldkeys = []
-        net_uids = []
+        replace_table_rows('owners', ('net_uid', 'owner_coldkey'), [(net_uid, to_db_key(coldkey)) for net_uid, coldkey in zip(net_uids, owner_coldkeys) if coldkey])
+        refresh_index()
 
-        for owner in results['subnet_owners']:
-            owner_coldkeys.append(convert_hex_to_ss58(owner['owner']))
-            net_uids.append(owner['subnet_id'])
+        print("Owner coldkey data has been saved to the database.")
+    except Exception as e:
+        sentry_sdk.capture_exception(e)
+        print(f"Exception in find_owner_coldkey (observing/utils/get_coldkeys.py): {e}")
 
-        db_path = 'DB/db.sqlite3'
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+def diff_validators(stored, fetched):
+    """
+    Compares the stored validators with the fetched ones, both keyed by hotkey.
+    
+    Args:
+        stored (dict): hot_key -> (cold_key, amount, name) of the rows in the database.
+        fetched (dict): hot_key -> (cold_key, amount, name) of the validators returned by the API.
+    
+    Returns:
+        tuple: (added, removed, changed) lists of hotkeys. added are new hotkeys, removed are stored hotkeys
+               no longer returned, and changed are hotkeys whose coldkey, amount or name differs from the stored row.
+    """
+    added = [hot_key for hot_key in fetched if hot_key not in stored]
+    removed = [hot_key for hot_key in stored if hot_key not in fetched]
+    changed = [
+        hot_key for hot_key, row in fetched.items()
+        if hot_key in stored and stored[hot_key] != row
+    ]
+    return added, removed, changed
 
-        cursor.execute('DROP TABLE IF EXISTS owners')
+def resolve_validator_names(hotkeys, client, refresh=False):
+    """
+    Returns the delegate names of the hotkeys, calling the API only for hotkeys that are not in the
+    name cache or whose cache entry has expired (all hotkeys if refresh is True).
+    Hotkeys whose name could not be fetched are left out of the result.
+    """
+    hotkeys = list(hotkeys)
+    if refresh:
+        names, misses = {}, hotkeys
+    else:
+        names, misses = load_names(hotkeys)
 
-        cursor.execute('''
-        CREATE TABLE owners (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            net_uid TEXT,
-            owner_coldkey TEXT
-        )
-        ''')
+    def fetch(hot_key):
+        try:
+            return hot_key, fetch_validator_name(hot_key, client), True
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            print(f"Exception in resolve_validator_names (observing/utils/get_coldkeys.py): {e}")
+            return hot_key, None, False
 
-        for net_uid, owner_coldkey in zip(net_uids, owner_coldkeys):
-            cursor.execute('''
-            INSERT INTO owners (net_uid, owner_coldkey)
-            VALUES (?, ?)
-            ''', (net_uid, owner_coldkey))
-        conn.commit()
-        conn.close()
+    fetched_names = {hot_key: name for hot_key, name, ok in client.map(fetch, misses) if ok}
+    store_names(fetched_names)
+    names.update(fetched_names)
+    print(f"Validator names: {len(hotkeys) - len(misses)} cached, {len(fetched_names)} fetched, {len(misses) - len(fetched_names)} failed")
+    return names
 
-        print("Owner coldkey data has been saved to the database.")
-    except Exception as e:
-        sentry_sdk.capture_exception(e)
-        print(f"Exception in find_owner_coldkey (observing/utils/get_coldkeys.py): {e}")
+def sync_validators(fetched, client, names=None):
+    """
+    Applies only the differences between the fetched validators and the validators table.
+    Names come from the name cache, so only new hotkeys and expired cache entries cost an API call.
+    
+    Args:
+        fetched (dict): hot_key -> (cold_key, amount) of the validators returned by the API.
+        names (dict): hot_key -> name to use instead of resolving the names through client.
+    """
+    with connection() as conn:
+        stored = {
+            from_db_key(hot_key): (from_db_key(cold_key), amount, name)
+            for hot_key, cold_key, amount, name in conn.execute('SELECT hot_key, cold_key, amount, name FROM validators')
+        }
+    if names is None:
+        names = resolve_validator_names(fetched, client)
+    fetched = {
+        # Keep the stored name if the name could not be fetched
+        hot_key: (cold_key, amount, names[hot_key] if hot_key in names else stored.get(hot_key, (None, None, None))[2])
+        for hot_key, (cold_key, amount) in fetched.items()
+    }
+    added, removed, changed = diff_validators(stored, fetched)
+    now = int(time.time())
+
+    with transaction() as conn:
+        conn.executemany('DELETE FROM validators WHERE hot_key = ?', [(to_db_key(hot_key),) for hot_key in removed])
+        conn.executemany(
+            'UPDATE validators SET cold_key = ?, amount = ?, name = ?, updated_at = ? WHERE hot_key = ?',
+            [(to_db_key(fetched[hot_key][0]), *fetched[hot_key][1:], now, to_db_key(hot_key)) for hot_key in changed]
+        )
+        conn.executemany(
+            'INSERT INTO validators (cold_key, amount, name, updated_at, hot_key) VALUES (?, ?, ?, ?, ?)',
+            [(to_db_key(fetched[hot_key][0]), *fetched[hot_key][1:], now, to_db_key(hot_key)) for hot_key in added]
+        )
+    print(f"Validator sync: {len(added)} added, {len(removed)} removed, {len(changed)} changed, {len(fetched) - len(added) - len(changed)} unchanged")
+    return added, removed, changed
 
-def find_validator_coldkey():
+def find_validator_coldkey(full=False):
     """
     Fetches validator coldkeys, hotkeys, and amounts from the API and saves them to the SQLite database.
+    By default only the differences with the stored validators are applied; with full=True the table
+    is rebuilt and every name is fetched again, bypassing the name cache.
     """
 
     init_sentry()
     
-    load_dotenv()
-    TAOSTATS_API_KEY = os.getenv('TAOSTATS_API_KEY')
-    
     try:
-        url = "https://api.taostats.io/api/v1/validator"
-        headers = {
-            "accept": "application/json",
-            "Authorization": TAOSTATS_API_KEY
-        }
+        if get_dataset_source() == 'chain':
+            find_validator_coldkey_on_chain(full)
+            return
 
-        all_validators = fetch_all_validators(url, headers)
+        client = get_client()
+        all_validators = fetch_all_validators(client)
+        if not all_validators:
+            # An empty result means the API call failed; keep the stored validators
+            print("No validators fetched, the validator dataset is not updated.")
+            return
 
-        validator_coldkeys = []
-        validator_hotkeys = []
-        validator_amounts = []
-        get_validator_names = []
+        fetched = {}
         for validator in all_validators:
-            amount = validator['amount']
-            if int(amount) > 1000:
-                validator_coldkeys.append(validator['cold_key']['ss58'])
-                validator_hotkeys.append(validator['hot_key']['ss58'])
-                name = get_validator_name(validator['hot_key']['ss58'], TAOSTATS_API_KEY)
-                # print(name)
-                get_validator_names.append(name)
-                validator_amounts.append(amount)
-
-        db_path = 'DB/db.sqlite3'
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('DROP TABLE IF EXISTS validators')
-
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS validators (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            cold_key TEXT,
-            hot_key TEXT,
-            amount TEXT,
-            name TEXT
-        )
-        ''')
-        print("validator dataset is updated")
-        print((validator_coldkeys, validator_hotkeys, validator_amounts, get_validator_names))
-        for cold_key, hot_key, amount, name in zip(validator_coldkeys, validator_hotkeys, validator_amounts, get_validator_names):
-            try:
-                print(f"Inserting: cold_key={cold_key}, hot_key={hot_key}, amount={amount}, name={name}")
-                cursor.execute('''
-                INSERT INTO validators (cold_key, hot_key, amount, name)
-                VALUES (?, ?, ?, ?)
-                ''', (cold_key, hot_key, amount, name))
-            except sqlite3.Error as e:
-                sentry_sdk.capture_exception(e)
-                print(f"Error inserting data (observing/utils/get_coldkeys.py): {e}")
-        conn.commit()
-        conn.close()
+            amount = int(validator['amount'])
+            if amount > 1000:
+                fetched[validator['hot_key']['ss58']] = (validator['cold_key']['ss58'], amount)
+
+        if full:
+            now = int(time.time())
+            names = resolve_validator_names(fetched, client, refresh=True)
+            rows = [
+                (to_db_key(cold_key), to_db_key(hot_key), amount, names.get(hot_key), now)
+                for hot_key, (cold_key, amount) in fetched.items()
+            ]
+            replace_table_rows('validators', ('cold_key', 'hot_key', 'amount', 'name', 'updated_at'), rows)
+        else:
+            sync_validators(fetched, client)
+        refresh_index()
         print("Validator coldkey data has been saved to the database.")
     except Exception as e:
         sentry_sdk.capture_exception(e)
         print(f"Exception in find_validator_coldkey (observing/utils/get_coldkeys.py): {e}")
 
-def get_validator_name(hotkey, TAOSTATS_API_KEY):
-    try:
-        url = f"https://api.taostats.io/api/v1/delegate/info?address={hotkey}"
-        headers = {
-            "accept": "application/json",
-            "Authorization": TAOSTATS_API_KEY
-        }
+def find_validator_coldkey_on_chain(full=False):
+    """
+    Reads the validators from chain storage (DATASET_SOURCE=chain) and saves them like find_validator_coldkey().
+    Names come from the on-chain identities of the coldkeys; validators without one keep their stored name.
+    """
+    chain = get_dataset_chain()
+    block_hash = get_dataset_block_hash()
+    fetched = load_validators(chain, block_hash)
+    if not fetched:
+        print("No validators read from the chain, the validator dataset is not updated.")
+        return
+    identities = load_identity_names(chain, block_hash)
+    names = {hot_key: identities[cold_key] for hot_key, (cold_key, amount) in fetched.items() if cold_key in identities}
 
-        response = requests.get(url, headers=headers)
-        # print(response.status_code)
-        if response.status_code == 429:  # Rate limit error
-            # print("Rate limit exceeded. Retrying...")
-            time.sleep(10)  # Wait for 10 seconds before retrying
-            return get_validator_name(hotkey, TAOSTATS_API_KEY)  # Retry the request
-        
-        response = response.json()
-        if response["count"] == 1:
-            return response["delegates"][0]["name"]
-        else:
-            return None
+    if full:
+        now = int(time.time())
+        rows = [
+            (to_db_key(cold_key), to_db_key(hot_key), amount, names.get(hot_key), now)
+            for hot_key, (cold_key, amount) in fetched.items()
+        ]
+        replace_table_rows('validators', ('cold_key', 'hot_key', 'amount', 'name', 'updated_at'), rows)
+    else:
+        sync_validators(fetched, None, names)
+    refresh_index()
+    print(f"Validator coldkey data has been read from the chain{f' at {block_hash}' if block_hash else ''} and saved to the database.")
+
+def fetch_validator_name(hotkey, client):
+    """
+    Fetches the delegate name of a hotkey from the TaoStats API.
+    Returns None if the hotkey has no delegate name; raises if the request fails.
+    """
+    response = client.get('/delegate/info', {"address": hotkey})
+    if response["count"] == 1:
+        return response["delegates"][0]["name"]
+    else:
+        return None
+
+def get_validator_name(hotkey, client):
+    """
+    Fetches the delegate name of a hotkey from the TaoStats API.
+    
+    Returns:
+        str: The name, or None if the hotkey has no delegate name or the request failed.
+    """
+    try:
+        return fetch_validator_name(hotkey, client)
     except Exception as e:
         sentry_sdk.capture_exception(e)
         print(f"Exception in get_validator_name (observing/utils/get_coldkeys.py): {e}")
@@ -222,7 +282,7 @@ if __name__ == "__main__":
     
     try:
         find_owner_coldkey()
-        find_validator_coldkey()
+        find_validator_coldkey(full='--full' in sys.argv)
     except Exception as e:
         sentry_sdk.capture_exception(e)
         print(f"Exception in main (observing/utils/get_coldkeys.py): {e}")
\ No newline at end of file
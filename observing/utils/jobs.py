@@ -0,0 +1,168 @@
+import os
+import sys
+import time
+import uuid
+import socket
+import threading
+import sentry_sdk
+from observing.utils.storage import connection, transaction
+
+# Background job coordinator.
+# A job (e.g. the owner table refresh) runs only while its process holds the job's lease in the job_leases
+# table. Leases expire after JOB_LEASE_TTL seconds, so a crashed process cannot block a job forever; while the
+# job runs, a heartbeat thread renews its lease every third of the TTL, so a long run keeps it.
+# Requests made while the job runs (in this or another process) set its pending flag; the running job then
+# runs once more when it finishes, so any number of requests collapse into at most one extra run. Taking the
+# lease or setting the flag, and finishing a run or releasing the lease, are each one transaction, so no
+# request falls between the two.
+
+def get_lease_ttl():
+    return int(os.getenv('JOB_LEASE_TTL', 900))
+
+def _new_owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def acquire_lease(name, ttl=None):
+    """
+    Takes the lease of job name if it is free or expired. Returns the owner token, or None if it is held;
+    the job's pending flag is then set in the same transaction, so the holder runs it once more.
+    """
+    owner = _new_owner()
+    now = int(time.time())
+    with transaction() as conn:
+        cursor = conn.execute(
+            '''INSERT INTO job_leases (name, owner, expires_at, pending, last_started_at) VALUES (?, ?, ?, 0, ?)
+               ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at,
+               pending = 0, last_started_at = excluded.last_started_at
+               WHERE job_leases.owner IS NULL OR job_leases.expires_at <= ?''',
+            (name, owner, now + (ttl or get_lease_ttl()), now, now),
+        )
+        if cursor.rowcount:
+            return owner
+        conn.execute('UPDATE job_leases SET pending = 1 WHERE name = ?', (name,))
+        return None
+
+def renew_lease(name, owner, ttl):
+    """Moves the expiry of the lease to ttl seconds from now. Returns False if owner no longer holds it."""
+    with transaction() as conn:
+        cursor = conn.execute('UPDATE job_leases SET expires_at = ? WHERE name = ? AND owner = ?', (int(time.time()) + ttl, name, owner))
+        return bool(cursor.rowcount)
+
+def release_lease(name, owner):
+    """Gives up the lease, if owner still holds it."""
+    with transaction() as conn:
+        conn.execute('UPDATE job_leases SET owner = NULL, expires_at = 0 WHERE name = ? AND owner = ?', (name, owner))
+
+def _mark_pending_if_held(name):
+    """Sets the pending flag of job name if its lease is held. Returns False if the lease is free."""
+    with transaction() as conn:
+        cursor = conn.execute(
+            'UPDATE job_leases SET pending = 1 WHERE name = ? AND owner IS NOT NULL AND expires_at > ?',
+            (name, int(time.time())),
+        )
+        return bool(cursor.rowcount)
+
+def _finish_run(name, owner, status, error, ttl):
+    """
+    Records the result of one run. Returns True if the job was requested again meanwhile; the lease is then
+    renewed, otherwise it is released in the same transaction.
+    """
+    now = int(time.time())
+    with transaction() as conn:
+        row = conn.execute('SELECT pending FROM job_leases WHERE name = ? AND owner = ?', (name, owner)).fetchone()
+        rerun = bool(row and row[0])
+        conn.execute(
+            '''UPDATE job_leases SET last_finished_at = ?, last_status = ?, last_error = ?, pending = 0,
+               owner = CASE WHEN ? THEN owner ELSE NULL END, expires_at = CASE WHEN ? THEN ? ELSE 0 END,
+               last_started_at = CASE WHEN ? THEN ? ELSE last_started_at END
+               WHERE name = ? AND owner = ?''',
+            (now, status, error, rerun, rerun, now + ttl, rerun, now, name, owner),
+        )
+        return rerun
+
+def _keep_lease(name, owner, ttl, stopped):
+    """Renews the lease every ttl / 3 seconds until stopped is set or the lease is lost."""
+    while not stopped.wait(max(1, ttl / 3)):
+        try:
+            if not renew_lease(name, owner, ttl):
+                print(f"Job {name} lost its lease.")
+                return
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            print(f"Exception in _keep_lease (observing/utils/jobs.py): {e}")
+
+def run_job(name, func, ttl=None):
+    """
+    Runs func under the lease of job name, in the calling thread.
+    Returns True if it ran, or False if another process holds the lease; the request is then left to that process.
+    """
+    ttl = ttl or get_lease_ttl()
+    owner = acquire_lease(name, ttl)
+    if owner is None:
+        print(f"Job {name} is already running, request queued.")
+        return False
+    stopped = threading.Event()
+    threading.Thread(target=_keep_lease, args=(name, owner, ttl, stopped), name=f"lease-{name}", daemon=True).start()
+    finished = False
+    try:
+        while True:
+            status, error = 'ok', None
+            try:
+                func()
+            except Exception as e:
+                sentry_sdk.capture_exception(e)
+                print(f"Exception in job {name} (observing/utils/jobs.py): {e}")
+                status, error = 'failed', str(e)
+            if not _finish_run(name, owner, status, error, ttl):
+                finished = True
+                break
+    finally:
+        stopped.set()
+        if not finished:
+            release_lease(name, owner)
+    return True
+
+_threads = {}
+_threads_lock = threading.Lock()
+
+def request_job(name, func):
+    """
+    Asks for job name to run in a background thread. Returns 'started', or 'queued' if it is already running,
+    in which case it runs once more after the current run.
+    """
+    with _threads_lock:
+        thread = _threads.get(name)
+        # A thread that already released the lease is about to exit; the request then needs a new run
+        if thread is not None and thread.is_alive() and _mark_pending_if_held(name):
+            return 'queued'
+        thread = threading.Thread(target=run_job, args=(name, func), name=f"job-{name}", daemon=True)
+        _threads[name] = thread
+        thread.start()
+        return 'started'
+
+def get_job_status(name=None):
+    """Returns the status dict of job name, or a list of all job statuses if name is None."""
+    now = int(time.time())
+    with connection() as conn:
+        query = 'SELECT name, owner, expires_at, pending, last_started_at, last_finished_at, last_status, last_error FROM job_leases'
+        rows = conn.execute(query + (' WHERE name = ?' if name else ' ORDER BY name'), (name,) if name else ()).fetchall()
+    statuses = [{
+        'name': row[0],
+        'running': row[1] is not None and row[2] > now,
+        'owner': row[1],
+        'pending': bool(row[3]),
+        'last_started_at': row[4],
+        'last_finished_at': row[5],
+        'last_status': row[6],
+        'last_error': row[7],
+    } for row in rows]
+    if name:
+        return statuses[0] if statuses else {'name': name, 'running': False, 'pending': False, 'last_status': None}
+    return statuses
+
+if __name__ == "__main__":
+
+    # python -m observing.utils.jobs [name]
+    statuses = get_job_status(sys.argv[1]) if len(sys.argv) > 1 else get_job_status()
+    for status in statuses if isinstance(statuses, list) else [statuses]:
+        print(status)
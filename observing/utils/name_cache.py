@@ -0,0 +1,70 @@
+import os
+import time
+from dotenv import load_dotenv
+from observing.utils.storage import connection, transaction
+
+# Persistent cache of TaoStats delegate names, keyed by hotkey (table delegate_names).
+# Hotkeys without a delegate name are cached too (name NULL), with a shorter TTL.
+# When the cache grows past DELEGATE_NAME_CACHE_SIZE entries the least recently used ones are evicted.
+
+load_dotenv()
+
+NAME_TTL = int(os.getenv('DELEGATE_NAME_TTL', 7 * 86400))
+NEGATIVE_TTL = int(os.getenv('DELEGATE_NAME_NEGATIVE_TTL', 86400))
+CACHE_SIZE = int(os.getenv('DELEGATE_NAME_CACHE_SIZE', 10000))
+
+def load_names(hotkeys):
+    """
+    Looks up hotkeys in the cache.
+
+    Returns:
+        tuple: (names, misses) where names maps every hotkey with a fresh entry to its name (None for
+               negative entries), and misses lists the hotkeys that are not cached or have expired.
+    """
+    hotkeys = list(hotkeys)
+    now = int(time.time())
+    with connection() as conn:
+        cached = {}
+        # Stay below SQLite's limit on the number of query parameters
+        for start in range(0, len(hotkeys), 500):
+            chunk = hotkeys[start:start + 500]
+            cached.update(
+                (hot_key, (name, fetched_at))
+                for hot_key, name, fetched_at in conn.execute(
+                    f'SELECT hot_key, name, fetched_at FROM delegate_names WHERE hot_key IN ({", ".join("?" for _ in chunk)})',
+                    chunk,
+                )
+            )
+    names = {}
+    misses = []
+    for hot_key in hotkeys:
+        entry = cached.get(hot_key)
+        if entry is None:
+            misses.append(hot_key)
+            continue
+        name, fetched_at = entry
+        ttl = NAME_TTL if name is not None else NEGATIVE_TTL
+        if now - fetched_at >= ttl:
+            misses.append(hot_key)
+        else:
+            names[hot_key] = name
+    if names:
+        with transaction() as conn:
+            conn.executemany('UPDATE delegate_names SET last_used = ? WHERE hot_key = ?', [(now, hot_key) for hot_key in names])
+    return names, misses
+
+def store_names(names):
+    """Stores freshly fetched names (None for hotkeys without a delegate name) and evicts the least recently used entries."""
+    if not names:
+        return
+    now = int(time.time())
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT INTO delegate_names (hot_key, name, fetched_at, last_used) VALUES (?, ?, ?, ?)
+            ON CONFLICT (hot_key) DO UPDATE SET name = excluded.name, fetched_at = excluded.fetched_at, last_used = excluded.last_used
+        ''', [(hot_key, name, now, now) for hot_key, name in names.items()])
+        conn.execute('''
+            DELETE FROM delegate_names WHERE hot_key IN (
+                SELECT hot_key FROM delegate_names ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        ''', (CACHE_SIZE,))
@@ -0,0 +1,57 @@
+import os
+from functools import lru_cache
+import sentry_sdk
+from substrateinterface.utils.ss58 import ss58_encode, ss58_decode
+
+# Address conversion between public keys and SS58 addresses.
+# Both directions are memoized in bounded LRU caches (SS58_MEMO_SIZE entries each): the same owner and
+# validator keys come back on every refresh, so base58 is computed once per key instead of once per refresh.
+# The batch functions convert whole lists and report failures to Sentry once per batch.
+
+SS58_FORMAT = 42
+MEMO_SIZE = int(os.getenv('SS58_MEMO_SIZE', 65536))
+
+def _to_bytes(public_key):
+    if isinstance(public_key, (bytes, bytearray)):
+        return bytes(public_key)
+    if public_key.startswith('0x'):
+        public_key = public_key[2:]
+    return bytes.fromhex(public_key)
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _encode(public_key, ss58_format):
+    return ss58_encode(public_key, ss58_format=ss58_format)
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _decode(address, ss58_format):
+    return bytes.fromhex(ss58_decode(address, valid_ss58_format=ss58_format))
+
+def encode_address(public_key, ss58_format=SS58_FORMAT):
+    """Converts a public key (hex string with or without 0x, or bytes) to its SS58 address. Raises on invalid input."""
+    return _encode(_to_bytes(public_key), ss58_format)
+
+def decode_address(address, ss58_format=SS58_FORMAT):
+    """Converts an SS58 address to its 32-byte public key. Raises on invalid input."""
+    return _decode(address, ss58_format)
+
+def _convert_many(convert, values, ss58_format, label):
+    results, failures = [], []
+    for value in values:
+        try:
+            results.append(convert(value, ss58_format))
+        except Exception as e:
+            results.append(None)
+            failures.append((value, e))
+    if failures:
+        value, error = failures[0]
+        sentry_sdk.capture_message(f"{len(failures)} of {len(results)} addresses could not be {label}, first: {value!r}: {error}")
+        print(f"Failed to convert {len(failures)} of {len(results)} addresses in {label} (observing/utils/ss58.py), first: {value!r}: {error}")
+    return results
+
+def encode_addresses(public_keys, ss58_format=SS58_FORMAT):
+    """Converts a list of public keys to SS58 addresses, in order. Invalid keys give None."""
+    return _convert_many(encode_address, public_keys, ss58_format, 'encoded')
+
+def decode_addresses(addresses, ss58_format=SS58_FORMAT):
+    """Converts a list of SS58 addresses to 32-byte public keys, in order. Invalid addresses give None."""
+    return _convert_many(decode_address, addresses, ss58_format, 'decoded')
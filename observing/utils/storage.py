@@ -0,0 +1,298 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+import sentry_sdk
+from dotenv import load_dotenv
+
+# Shared SQLite storage for the observer and the dataset refresh.
+# All modules get their connections from the pool below, so the database is opened in WAL mode
+# (readers are never blocked by the daily refresh) and the schema is migrated before first use.
+
+load_dotenv()
+
+DB_PATH = os.getenv('DB_PATH', 'DB/db.sqlite3')
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 4))
+BUSY_TIMEOUT = 30  # Seconds to wait for a lock held by another writer
+ACCOUNT_KEY_FORMAT = os.getenv('ACCOUNT_KEY_FORMAT', 'ss58')  # 'ss58' or 'blob' (see observing/utils/account_keys.py)
+
+_pool = None
+_pool_slots = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def _open_connection():
+    """Opens a connection in autocommit mode; transactions are started explicitly with transaction()."""
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+def _init_pool():
+    """Creates the pool and migrates the schema. A forked process (scan workers) gets a fresh pool."""
+    global _pool, _pool_slots, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            return
+        conn = _open_connection()
+        try:
+            migrate(conn)
+            from observing.utils.account_keys import needs_conversion, convert_account_keys
+            if needs_conversion(conn):
+                convert_account_keys(conn)
+        finally:
+            conn.close()
+        _pool = queue.LifoQueue()
+        _pool_slots = threading.BoundedSemaphore(POOL_SIZE)
+        _pool_pid = os.getpid()
+
+@contextmanager
+def connection():
+    """
+    Borrows a connection from the shared pool. At most DB_POOL_SIZE connections are open at once;
+    further callers wait until one is returned.
+    """
+    if _pool is None or _pool_pid != os.getpid():
+        _init_pool()
+    pool, slots = _pool, _pool_slots
+    slots.acquire()
+    try:
+        try:
+            conn = pool.get_nowait()
+        except queue.Empty:
+            conn = _open_connection()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            pool.put(conn)
+    finally:
+        slots.release()
+
+@contextmanager
+def transaction():
+    """Borrows a connection and runs the block in one write transaction, committed on success and rolled back on error."""
+    with connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+
+def replace_table_rows(table, columns, rows):
+    """
+    Replaces every row of `table` without readers ever seeing a partial dataset.
+    The rows are bulk inserted into a shadow table first; the shadow table is then swapped in
+    with one short transaction that drops the old table, renames the shadow table, recreates the indexes and
+    triggers, and bumps the table's change counter in table_versions.
+
+    Parameters:
+    table (str): The table to replace, e.g. 'validators'.
+    columns (tuple): The column names the rows provide.
+    rows (list): The new rows, as tuples in the order of columns.
+    """
+    shadow = f'{table}_shadow'
+    placeholders = ', '.join('?' for _ in columns)
+    with transaction() as conn:
+        create_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+        conn.execute(f'DROP TABLE IF EXISTS {shadow}')
+        # After a previous swap SQLite stores the renamed table as CREATE TABLE "table"
+        conn.execute(re.sub(rf'^CREATE TABLE\s+"?{table}"?', f'CREATE TABLE {shadow}', create_sql, count=1))
+        conn.executemany(f'INSERT INTO {shadow} ({", ".join(columns)}) VALUES ({placeholders})', rows)
+    with transaction() as conn:
+        index_sqls = [sql for (sql,) in conn.execute("SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? AND sql IS NOT NULL", (table,))]
+        conn.execute(f'DROP TABLE {table}')
+        conn.execute(f'ALTER TABLE {shadow} RENAME TO {table}')
+        for index_sql in index_sqls:
+            conn.execute(index_sql)
+        conn.execute('UPDATE table_versions SET version = version + 1 WHERE name = ?', (table,))
+
+def _table_exists(conn, table):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+def _rebuild_table(conn, table, create_sql, columns, select_sql):
+    """
+    Creates `table` from create_sql. If a table with this name already exists, its rows are copied
+    into the new one with `INSERT INTO table (columns) select_sql` (select_sql reads from `<table>_legacy`).
+    """
+    if _table_exists(conn, table):
+        conn.execute(f'ALTER TABLE {table} RENAME TO {table}_legacy')
+        conn.execute(create_sql)
+        conn.execute(f'INSERT INTO {table} ({columns}) {select_sql}')
+        conn.execute(f'DROP TABLE {table}_legacy')
+    else:
+        conn.execute(create_sql)
+
+def _migrate_v1(conn):
+    """Typed columns and lookup indexes. Converts the TEXT columns of the original DB/db.sqlite3."""
+    _rebuild_table(conn, 'validators', '''
+        CREATE TABLE validators (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cold_key TEXT NOT NULL,
+            hot_key TEXT NOT NULL,
+            amount INTEGER NOT NULL DEFAULT 0,
+            name TEXT
+        )''',
+        'id, cold_key, hot_key, amount, name',
+        'SELECT id, cold_key, hot_key, CAST(amount AS INTEGER), name FROM validators_legacy WHERE cold_key IS NOT NULL AND hot_key IS NOT NULL')
+    _rebuild_table(conn, 'owners', '''
+        CREATE TABLE owners (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            net_uid INTEGER NOT NULL,
+            owner_coldkey TEXT NOT NULL
+        )''',
+        'id, net_uid, owner_coldkey',
+        'SELECT id, CAST(net_uid AS INTEGER), owner_coldkey FROM owners_legacy WHERE net_uid IS NOT NULL AND owner_coldkey IS NOT NULL')
+    _rebuild_table(conn, 'current_block_number', '''
+        CREATE TABLE current_block_number (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            current_block_number INTEGER NOT NULL
+        )''',
+        'id, current_block_number',
+        'SELECT id, CAST(current_block_number AS INTEGER) FROM current_block_number_legacy WHERE current_block_number IS NOT NULL')
+    conn.execute('CREATE INDEX idx_validators_cold_key ON validators (cold_key)')
+    conn.execute('CREATE INDEX idx_validators_hot_key ON validators (hot_key)')
+    conn.execute('CREATE INDEX idx_owners_owner_coldkey ON owners (owner_coldkey)')
+    conn.execute('CREATE INDEX idx_owners_net_uid ON owners (net_uid)')
+
+def _migrate_v2(conn):
+    """Per-row update time of the validators, used by the incremental sync."""
+    conn.execute('ALTER TABLE validators ADD COLUMN updated_at INTEGER NOT NULL DEFAULT 0')
+
+def _migrate_v3(conn):
+    """Persistent delegate name cache, seeded with the names already stored for the validators."""
+    conn.execute('''
+        CREATE TABLE delegate_names (
+            hot_key TEXT PRIMARY KEY,
+            name TEXT,
+            fetched_at INTEGER NOT NULL,
+            last_used INTEGER NOT NULL
+        )''')
+    conn.execute('CREATE INDEX idx_delegate_names_last_used ON delegate_names (last_used)')
+    conn.execute('''
+        INSERT OR IGNORE INTO delegate_names (hot_key, name, fetched_at, last_used)
+        SELECT hot_key, name, CAST(strftime('%s', 'now') AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER) FROM validators
+    ''')
+
+def _migrate_v4(conn):
+    """Retry queue for Discord posts that could not be delivered."""
+    conn.execute('''
+        CREATE TABLE discord_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            webhook_url TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at INTEGER NOT NULL,
+            created_at INTEGER NOT NULL
+        )''')
+    conn.execute('CREATE INDEX idx_discord_outbox_next_attempt_at ON discord_outbox (next_attempt_at)')
+
+def _migrate_v5(conn):
+    """Single-row block cursor and a log of processed/skipped block ranges, replacing current_block_number."""
+    conn.execute('''
+        CREATE TABLE block_cursor (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            block_number INTEGER NOT NULL,
+            block_hash TEXT,
+            processed_at INTEGER NOT NULL
+        )''')
+    conn.execute('''
+        CREATE TABLE block_ranges (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            start_block INTEGER NOT NULL,
+            end_block INTEGER NOT NULL,
+            status TEXT NOT NULL CHECK (status IN ('processed', 'skipped')),
+            updated_at INTEGER NOT NULL
+        )''')
+    conn.execute('CREATE INDEX idx_block_ranges_start_block ON block_ranges (start_block)')
+    if _table_exists(conn, 'current_block_number'):
+        conn.execute('''
+            INSERT INTO block_cursor (id, block_number, block_hash, processed_at)
+            SELECT 1, MAX(current_block_number), NULL, CAST(strftime('%s', 'now') AS INTEGER)
+            FROM current_block_number HAVING MAX(current_block_number) IS NOT NULL''')
+        conn.execute('DROP TABLE current_block_number')
+
+def _migrate_v6(conn):
+    """Leases and status of the background jobs (dataset refreshes), replacing thread_status.status."""
+    conn.execute('''
+        CREATE TABLE job_leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT,
+            expires_at INTEGER NOT NULL DEFAULT 0,
+            pending INTEGER NOT NULL DEFAULT 0,
+            last_started_at INTEGER,
+            last_finished_at INTEGER,
+            last_status TEXT,
+            last_error TEXT
+        )''')
+
+def _migrate_v7(conn):
+    """Covering indexes for SQL account lookups (key -> name, hotkey, netuid), so they never read the table rows."""
+    for index in ('idx_validators_cold_key', 'idx_validators_hot_key', 'idx_owners_owner_coldkey', 'idx_owners_net_uid'):
+        conn.execute(f'DROP INDEX IF EXISTS {index}')
+    conn.execute('CREATE INDEX idx_validators_cold_key ON validators (cold_key, hot_key, name)')
+    conn.execute('CREATE INDEX idx_validators_hot_key ON validators (hot_key, cold_key, name)')
+    conn.execute('CREATE INDEX idx_owners_owner_coldkey ON owners (owner_coldkey, net_uid)')
+    conn.execute('CREATE INDEX idx_owners_net_uid ON owners (net_uid, owner_coldkey)')
+
+def _migrate_v8(conn):
+    """Name/value settings of the database itself, e.g. the format the account keys were last converted to."""
+    conn.execute('CREATE TABLE storage_settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+def _migrate_v9(conn):
+    """
+    Change counters of the validators and owners tables, bumped by triggers on every row change and by
+    replace_table_rows(), so other processes notice that their in-memory account index is stale.
+    """
+    conn.execute('CREATE TABLE table_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)')
+    for table in ('validators', 'owners'):
+        conn.execute('INSERT INTO table_versions (name) VALUES (?)', (table,))
+        for operation in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER {table}_{operation.lower()}_version AFTER {operation} ON {table}
+                BEGIN UPDATE table_versions SET version = version + 1 WHERE name = '{table}'; END''')
+
+# MIGRATIONS[i] upgrades the schema from version i to version i + 1 (stored in PRAGMA user_version).
+MIGRATIONS = [
+    _migrate_v1,
+    _migrate_v2,
+    _migrate_v3,
+    _migrate_v4,
+    _migrate_v5,
+    _migrate_v6,
+    _migrate_v7,
+    _migrate_v8,
+    _migrate_v9,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def migrate(conn):
+    """Applies every pending migration, each in its own transaction."""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for next_version in range(version + 1, SCHEMA_VERSION + 1):
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # Another process may have migrated while we waited for the lock
+            if conn.execute('PRAGMA user_version').fetchone()[0] >= next_version:
+                conn.rollback()
+                continue
+            MIGRATIONS[next_version - 1](conn)
+            conn.execute(f'PRAGMA user_version = {next_version}')
+            conn.commit()
+            print(f"Database migrated to schema version {next_version}")
+        except sqlite3.Error as e:
+            conn.rollback()
+            sentry_sdk.capture_exception(e)
+            print(f"Database error in migrate (observing/utils/storage.py): {e}")
+            raise
+
+if __name__ == "__main__":
+    # Migrates DB_PATH (e.g. the original DB/db.sqlite3) to the current schema version.
+    with connection() as conn:
+        print(f"{DB_PATH} is at schema version {conn.execute('PRAGMA user_version').fetchone()[0]}")
@@ -0,0 +1,127 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+# Shared TaoStats API client.
+# One pooled requests.Session is used for every call; a token bucket keeps the request rate under
+# TAOSTATS_RATE_PER_MINUTE, a 429 pauses the whole bucket for the Retry-After time, and failed calls
+# are retried with exponential backoff and jitter up to TAOSTATS_MAX_RETRIES times.
+
+API_URL = "https://api.taostats.io/api/v1"
+
+class TaoStatsError(Exception):
+    """Raised when a TaoStats request still fails after the retry budget is used up."""
+
+class TokenBucket:
+    """Thread-safe token bucket. acquire() blocks until a token is available."""
+
+    def __init__(self, rate_per_second, capacity):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def pause(self, seconds):
+        """Stops handing out tokens for the given number of seconds (used for Retry-After)."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    self.updated = self.paused_until
+                    wait = self.paused_until - now
+            time.sleep(wait)
+
+class TaoStatsClient:
+    def __init__(self, api_key, concurrency=4, rate_per_minute=60, max_retries=5, backoff_base=1.0, backoff_max=60.0, timeout=30):
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate_per_minute / 60, capacity=self.concurrency)
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency))
+        self.session.headers.update({
+            "accept": "application/json",
+            "Authorization": api_key,
+        })
+
+    def _backoff(self, attempt):
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def get(self, path, params=None):
+        """
+        GETs an API path (e.g. '/validator') and returns the decoded JSON body.
+        Raises TaoStatsError once the retry budget is used up.
+        """
+        url = path if path.startswith('http') else f"{API_URL}{path}"
+        error = None
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = e
+                time.sleep(self._backoff(attempt))
+                continue
+            if response.status_code == 429:
+                error = TaoStatsError(f"Rate limited on {url}")
+                retry_after = response.headers.get('Retry-After')
+                try:
+                    delay = float(retry_after)
+                except (TypeError, ValueError):
+                    delay = self._backoff(attempt)
+                self.bucket.pause(delay)
+                continue
+            if response.status_code >= 500:
+                error = TaoStatsError(f"HTTP {response.status_code} on {url}")
+                time.sleep(self._backoff(attempt))
+                continue
+            response.raise_for_status()
+            return response.json()
+        raise TaoStatsError(f"Giving up on {url} after {self.max_retries + 1} attempts: {error}")
+
+    def map(self, func, items):
+        """Runs func over items with up to `concurrency` requests in flight and returns the results in order."""
+        items = list(items)
+        if self.concurrency == 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='taostats') as executor:
+            return list(executor.map(func, items))
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Returns the shared client, configured from the environment."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            load_dotenv()
+            _client = TaoStatsClient(
+                os.getenv('TAOSTATS_API_KEY'),
+                concurrency=int(os.getenv('TAOSTATS_CONCURRENCY', 4)),
+                rate_per_minute=float(os.getenv('TAOSTATS_RATE_PER_MINUTE', 60)),
+                max_retries=int(os.getenv('TAOSTATS_MAX_RETRIES', 5)),
+            )
+        return _client
@@ -3,15 +3,10 @@
 # and posts these reports to Discord.
 
 import os
+import sys
 import time
-import threading
-import subprocess
 from datetime import datetime
-from observing.bot.bot import post_to_discord
-from observing.observer.observer import observer_block
-from observing.utils.get_coldkeys import find_owner_coldkey
-from main import check_thread_status
-import os
+from observing.utils.jobs import request_job
 import sentry_sdk
 from dotenv import load_dotenv
 
@@ -26,19 +21,35 @@ def init_sentry():
         traces_sample_rate=1.0
     )
 
-def run_update_owner_coldkey_function():
-    """Runs the find_owner_coldkey function in a new thread."""
+def update_owner_coldkey():
+    """Refreshes the owner table; run as the 'owner_refresh' job."""
+    from observing.utils.get_coldkeys import find_owner_coldkey
+    find_owner_coldkey()
+
+def get_channel_webhook(channel):
+    """Returns the Discord webhook of a detector channel, e.g. 'coldkey_swap' -> COLDKEY_SWAP_DISCORD_WEBHOOK_URL."""
+    return os.getenv(f"{channel.upper()}_DISCORD_WEBHOOK_URL")
+
+def publish_reports(result):
+    """Posts the reports of one observed block to Discord and refreshes the owner table if needed."""
     try:
-        # Update the status to running
-        with open('thread_status.status', 'w') as f:
-            f.write('running')
-        find_owner_coldkey()
-        # Update the status to not running
-        with open('thread_status.status', 'w') as f:
-            f.write('not running')
+        load_dotenv()
+        
+        reports, should_update_owner_table = result
+
+        # Refresh the owner table in the background; repeated requests while it runs collapse into one more run.
+        if should_update_owner_table:
+            if request_job('owner_refresh', update_owner_coldkey) == 'queued':
+                print("Update owner coldkey function is already running, queued one more run.")
+        
+        from observing.bot.bot import deliver
+        deliver([
+            (report['report'], get_channel_webhook(report['channel']))
+            for report in reports
+        ])
     except Exception as e:
         sentry_sdk.capture_exception(e)
-        print(f"Exception in run_update_owner_coldkey_function (run.py): {e}")
+        print(f"Exception in publish_reports (run.py): {e}")
 
 def run():
     
@@ -48,27 +59,8 @@ def run():
         start_time = time.time()
         print(f"Start time: {datetime.fromtimestamp(start_time).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}")
 
-        load_dotenv()
-        
-        COLDKEY_SWAP_DISCORD_WEBHOOK_URL = os.getenv('COLDKEY_SWAP_DISCORD_WEBHOOK_URL')
-        DISSOLVE_NETWORK_DISCORD_WEBHOOK_URL = os.getenv('DISSOLVE_NETWORK_DISCORD_WEBHOOK_URL')
-
-        report_swap_coldkey, report_dissolve_network, report_vote, dissloved_subnet_resport, swapped_coldkey_report, should_update_owner_table = observer_block()
-
-        # Run the get_coldkey.py script in a new thread if the owner database should be updated.
-        if should_update_owner_table:
-            thread_status = check_thread_status()
-            if thread_status == 'not running':
-                update_owner_thread = threading.Thread(target=run_update_owner_coldkey_function)
-                update_owner_thread.start()
-            else:
-                print("Update owner coldkey function is already running.")
-        
-        post_to_discord(report_swap_coldkey, COLDKEY_SWAP_DISCORD_WEBHOOK_URL)
-        post_to_discord(report_dissolve_network, DISSOLVE_NETWORK_DISCORD_WEBHOOK_URL)
-        post_to_discord(dissloved_subnet_resport, DISSOLVE_NETWORK_DISCORD_WEBHOOK_URL)
-        post_to_discord(report_vote, COLDKEY_SWAP_DISCORD_WEBHOOK_URL)
-        post_to_discord(swapped_coldkey_report, COLDKEY_SWAP_DISCORD_WEBHOOK_URL)
+        from observing.observer.observer import observer_block
+        publish_reports(observer_block())
         
         end_time = time.time()
         print(f"End time: {datetime.fromtimestamp(end_time).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}")
@@ -77,12 +69,28 @@ def run():
         sentry_sdk.capture_exception(e)
         print(f"Exception in run (run.py): {e}")
 
+def run_observer():
+    """Runs the persistent observer, publishing the reports of every new block as its header arrives."""
+    
+    init_sentry()
+    
+    def handle_reports(reports):
+        start_time = time.time()
+        publish_reports(reports)
+        print(f"Reports published in {time.time() - start_time:.3f} seconds")
+    
+    from observing.observer.observer import observe_new_blocks
+    observe_new_blocks(handle_reports)
+
 if __name__ == "__main__":
     
     init_sentry()
     
     try:
-        run()
+        if '--once' in sys.argv:
+            run()
+        else:
+            run_observer()
     except Exception as e:
         sentry_sdk.capture_exception(e)
         print(f"Exception in main (run.py): {e}")
\ No newline at end of file
@@ -0,0 +1,198 @@
+# Historical range scanner.
+# Streams a range of blocks through the same detection logic as the live observer and writes
+# every report to a JSON lines file instead of Discord.
+#
+# Usage: python scan.py --from 3877000 --to 3960000 [--workers 8] [--output scan_reports.jsonl]
+
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import sentry_sdk
+from dotenv import load_dotenv
+from observing.observer.backfill import ordered_map
+
+_substrate = None
+
+def init_scan_worker():
+    """Opens the chain connection used by one scan worker process."""
+    global _substrate
+    load_dotenv()
+    from observing.observer.observer import setup_substrate_interface
+    _substrate = setup_substrate_interface()
+
+def scan_block(block_number):
+    """
+    Fetches, decodes and analyzes one block in a worker process. The database is not modified.
+    Returns the reports as (name, report) pairs, or None if the block could not be fetched in FETCH_ATTEMPTS
+    attempts (default 3). Each retry waits FETCH_RETRY_DELAY seconds (default 1, doubled every time) and reconnects.
+    """
+    global _substrate
+    from observing.observer.observer import setup_substrate_interface, get_block_data, analyze_block
+    attempts = max(1, int(os.getenv('FETCH_ATTEMPTS', 3)))
+    delay = float(os.getenv('FETCH_RETRY_DELAY', 1))
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(delay)
+            delay *= 2
+        if _substrate is None:
+            _substrate = setup_substrate_interface()
+            if _substrate is None:
+                continue
+        block, events = get_block_data(_substrate, block_number)
+        if block is not None and events is not None:
+            reports, should_update_owner_table = analyze_block(block_number, block, events, apply_updates=False)
+            return [(report['name'], report['report']) for report in reports]
+        # The next attempt opens a new connection, in case this one is broken
+        try:
+            _substrate.close()
+        except Exception:
+            pass
+        _substrate = None
+    return None
+
+def read_checkpoint(checkpoint_path):
+    """Returns the last fully scanned block number stored in the checkpoint file, or None."""
+    try:
+        with open(checkpoint_path, 'r') as f:
+            return int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+def write_checkpoint(checkpoint_path, block_number):
+    """Atomically stores the last fully scanned block number."""
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(str(block_number))
+    os.replace(tmp_path, checkpoint_path)
+
+def read_written_blocks(output_path, after_block):
+    """Returns the numbers of the blocks after after_block that already have reports in output_path."""
+    written = set()
+    try:
+        with open(output_path, 'r') as f:
+            for line in f:
+                try:
+                    block_number = json.loads(line)['block_number']
+                except (ValueError, KeyError):
+                    continue
+                if block_number > after_block:
+                    written.add(block_number)
+    except FileNotFoundError:
+        pass
+    return written
+
+def write_failed_blocks(failed_path, failed):
+    """Stores the blocks that could not be scanned, one per line, or removes the file if there are none."""
+    if failed:
+        with open(failed_path, 'w') as f:
+            f.write(''.join(f"{block_number}\n" for block_number in failed))
+    elif os.path.exists(failed_path):
+        os.remove(failed_path)
+
+def scan(from_block, to_block, workers, output_path, checkpoint_path, prefetch, checkpoint_interval=100, failed_path=None):
+    """
+    Scans the blocks from_block..to_block (inclusive) and appends every report to output_path.
+    Resumes after the block stored in checkpoint_path if it lies inside the range; reports that were already
+    written after that block are not written again.
+    Blocks that cannot be fetched are retried once more after the range. The ones that still fail are written to
+    failed_path (default <output>.failed), and the checkpoint never moves past the first of them.
+    """
+    failed_path = failed_path or f"{output_path}.failed"
+    last_scanned = read_checkpoint(checkpoint_path)
+    if last_scanned is not None and from_block <= last_scanned < to_block:
+        print(f"Resuming after checkpoint block {last_scanned}")
+        from_block = last_scanned + 1
+    elif last_scanned is not None and last_scanned >= to_block:
+        print(f"Range already scanned up to block {last_scanned}")
+        return
+    written = read_written_blocks(output_path, from_block - 1)
+
+    start_time = time.time()
+    last_progress = start_time
+    scanned = 0
+    found = 0
+    failed = []
+
+    def checkpoint(block_number):
+        # Everything before the first failed block is complete
+        safe_block = failed[0] - 1 if failed else block_number
+        if safe_block >= from_block:
+            output.flush()
+            write_checkpoint(checkpoint_path, safe_block)
+
+    with open(output_path, 'a') as output, \
+            ProcessPoolExecutor(max_workers=workers, initializer=init_scan_worker) as executor:
+        def write_reports(block_number, reports):
+            nonlocal found
+            if block_number in written:
+                return
+            for name, report in reports:
+                output.write(json.dumps({"block_number": block_number, "type": name, "report": report}) + "\n")
+                found += 1
+
+        for block_number, reports in ordered_map(executor, scan_block, range(from_block, to_block + 1), prefetch):
+            if reports is None:
+                print(f"Block {block_number} could not be fetched, retrying after the range")
+                failed.append(block_number)
+            else:
+                write_reports(block_number, reports)
+                scanned += 1
+            if (block_number - from_block + 1) % checkpoint_interval == 0:
+                checkpoint(block_number)
+            now = time.time()
+            if now - last_progress >= 10:
+                print(f"Block {block_number}: {scanned} blocks, {found} reports, {len(failed)} failed, {scanned / (now - start_time):.1f} blocks/s")
+                last_progress = now
+
+        if failed:
+            print(f"Retrying {len(failed)} failed blocks")
+            retried, failed = failed, []
+            for block_number, reports in ordered_map(executor, scan_block, retried, prefetch):
+                if reports is None:
+                    failed.append(block_number)
+                else:
+                    write_reports(block_number, reports)
+                    scanned += 1
+        checkpoint(to_block)
+
+    write_failed_blocks(failed_path, failed)
+    elapsed = time.time() - start_time
+    print(f"Scanned {scanned} blocks in {elapsed:.1f} seconds ({scanned / elapsed if elapsed else 0:.1f} blocks/s), {found} reports written to {output_path}")
+    if failed:
+        print(f"{len(failed)} blocks could not be scanned, listed in {failed_path}; the checkpoint stays at block {failed[0] - 1}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay a block range through the observer detection logic.")
+    parser.add_argument('--from', dest='from_block', type=int, required=True, help="First block to scan.")
+    parser.add_argument('--to', dest='to_block', type=int, required=True, help="Last block to scan (inclusive).")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help="Number of fetch/decode worker processes.")
+    parser.add_argument('--prefetch', type=int, default=None, help="Number of blocks requested ahead of the writer (default: 4 per worker).")
+    parser.add_argument('--output', default='scan_reports.jsonl', help="JSON lines file the reports are appended to.")
+    parser.add_argument('--checkpoint', default=None, help="Checkpoint file used to resume the scan (default: <output>.checkpoint).")
+    parser.add_argument('--failed', default=None, help="File listing the blocks that could not be scanned (default: <output>.failed).")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+
+    load_dotenv()
+    sentry_sdk.init(dsn=os.getenv('SENTRY_DSN'), traces_sample_rate=1.0)
+
+    args = parse_args()
+    if args.to_block < args.from_block:
+        raise SystemExit("--to must not be lower than --from")
+
+    try:
+        scan(
+            args.from_block,
+            args.to_block,
+            args.workers,
+            args.output,
+            args.checkpoint or f"{args.output}.checkpoint",
+            args.prefetch or args.workers * 4,
+            failed_path=args.failed,
+        )
+    except Exception as e:
+        sentry_sdk.capture_exception(e)
+        print(f"Exception in main (scan.py): {e}")